@@ -0,0 +1,179 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+try:
+    from . import metrics
+except ImportError:  # run as a script from backend/
+    import metrics
+
+# Configured limits are totals for the server; each of the WEB_CONCURRENCY
+# worker processes (see backend/gunicorn_conf.py) enforces its share.
+SERVER_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Initial guess of how long a slot is held, until real timings come in.
+DEFAULT_SERVICE_SECONDS = 1.0
+
+
+class Overloaded(Exception):
+    """The request was not admitted; ``status`` is 429 (queue full) or 503
+    (waited longer than the queue timeout)."""
+
+    def __init__(self, pool, status, retry_after):
+        super().__init__(f"{pool} is overloaded, retry in {retry_after}s")
+        self.pool = pool
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's slot; release it exactly once (extra calls are
+    ignored), typically via ``async with``."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.start = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release(time.monotonic() - self.start)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionPool:
+    """Concurrency limit with a bounded, per-session round-robin queue.
+
+    At most ``limit`` requests hold a slot; up to ``queue_size`` more wait.
+    Freed slots go to sessions in turn, so one client queueing many
+    requests cannot starve the others. A pool with ``yields_to`` only grants
+    slots while those pools have nobody waiting.
+    """
+
+    def __init__(self, name, limit, queue_size, yields_to=()):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.yields_to = list(yields_to)
+        self.dependents = []
+        for pool in self.yields_to:
+            pool.dependents.append(self)
+        self.active = 0
+        self.queued = 0
+        self.waiters = OrderedDict()
+        self.service_seconds = DEFAULT_SERVICE_SECONDS
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new request should drain."""
+        return max(1, math.ceil((self.queued + 1) / self.limit * self.service_seconds))
+
+    def _can_grant(self):
+        return self.active < self.limit and not any(pool.queued for pool in self.yields_to)
+
+    def _grant_waiting(self):
+        while self.waiters and self._can_grant():
+            session, queue = self.waiters.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                self.waiters[session] = queue
+            self.queued -= 1
+            if future.done():  # cancelled while waiting
+                continue
+            self.active += 1
+            future.set_result(Ticket(self))
+        if not self.queued:
+            for pool in self.dependents:
+                pool._grant_waiting()
+
+    def _release(self, held_seconds):
+        self.active -= 1
+        # Exponentially weighted mean of slot hold times, for Retry-After.
+        self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+        self._grant_waiting()
+
+    def _discard(self, session, future):
+        queue = self.waiters.get(session)
+        if queue and future in queue:
+            queue.remove(future)
+            self.queued -= 1
+            if not queue:
+                del self.waiters[session]
+            self._grant_waiting()
+
+    async def acquire(self, session=None, timeout=QUEUE_TIMEOUT):
+        if self._can_grant() and not self.waiters:
+            self.active += 1
+            return Ticket(self)
+        if self.queued >= self.queue_size:
+            metrics.count(f"admission_rejected_{self.name}")
+            raise Overloaded(self.name, 429, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(session, deque()).append(future)
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(session, future)
+            metrics.count(f"admission_timeouts_{self.name}")
+            raise Overloaded(self.name, 503, self.retry_after())
+        except asyncio.CancelledError:
+            self._abandon(session, future)
+            raise
+        metrics.record_stage(f"queue_{self.name}", time.perf_counter() - start)
+        return ticket
+
+    def _abandon(self, session, future):
+        if future.done() and not future.cancelled():
+            # Granted just as we gave up: hand the slot back.
+            future.result().release()
+        else:
+            future.cancel()
+            self._discard(session, future)
+
+
+def client_key(request):
+    """Admission session for requests that carry no session id: the client's
+    address. Behind nginx every peer is 127.0.0.1, so the address nginx sets
+    in X-Real-IP (or appends to X-Forwarded-For) is preferred."""
+    real_ip = request.headers.get("x-real-ip", "").strip()
+    if real_ip:
+        return real_ip
+    forwarded = request.headers.get("x-forwarded-for", "")
+    if forwarded.strip():
+        # The last hop is the one our proxy added; earlier ones are the client's claim.
+        return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else None
+
+
+class Admission:
+    """The server's admission pools. Interactive queries have priority:
+    ingestion and role tasks only start while no query is waiting.
+
+    Each worker process gets ``1 / workers`` of every limit and queue (at
+    least one), so the server as a whole keeps the configured totals.
+    Priority is decided per worker.
+    """
+
+    def __init__(self, workers=SERVER_WORKERS):
+        self.workers = workers
+        self.interactive = self._pool("interactive", 16, 128)
+        self.podcast = self._pool("podcast", 4, 16)
+        self.ingest = self._pool("ingest", 2, 8, yields_to=[self.interactive])
+        self.role_task = self._pool("role_task", 2, 8, yields_to=[self.interactive])
+
+    def _pool(self, name, limit, queue_size, yields_to=()):
+        key = name.upper()
+        limit = int(os.getenv(f"ADMISSION_{key}_LIMIT", str(limit)))
+        queue_size = int(os.getenv(f"ADMISSION_{key}_QUEUE", str(queue_size)))
+        return AdmissionPool(
+            name, max(1, limit // self.workers), max(1, queue_size // self.workers), yields_to)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+EPISODE_CACHE_MAX_BYTES = int(os.getenv("EPISODE_CACHE_MAX_MB", "1024")) * 1024 * 1024
+STALE_TMP_SECONDS = 3600
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def tts_key(voice, output_format, text):
+    return hashlib.sha256(f"{voice}|{output_format}|{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def episode_key(index_version, selected_text):
+    return hashlib.sha256(f"{index_version}|{normalize_text(selected_text)}".encode("utf-8")).hexdigest()
+
+
+class DiskLRUCache:
+    """Size-capped directory of immutable blobs with LRU eviction.
+
+    Recency is the file mtime (touched on every hit), so the LRU order
+    survives restarts. Entries are published with an atomic rename.
+    """
+
+    def __init__(self, root, max_bytes, suffix=".mp3"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            # Left behind by an interrupted write (recent ones may belong to
+            # another worker process that is still streaming).
+            if name.endswith(".tmp") and time.time() - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                self.discard(path)
+        self.total_bytes = sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        for name in os.listdir(self.root):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, st.st_mtime, st.st_size
+
+    def path_for(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def lookup(self, key):
+        """Return the cached file path for ``key`` (marking it recently used)."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.commit(key, tmp_path)
+
+    def open_temp(self):
+        """Return ``(file, tmp_path)`` for streaming an entry; publish it with
+        :meth:`commit` or drop it with :meth:`discard`."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        return os.fdopen(fd, "wb"), tmp_path
+
+    def commit(self, key, tmp_path):
+        path = self.path_for(key)
+        size = os.path.getsize(tmp_path)
+        with self.lock:
+            existed = os.path.exists(path)
+            old_size = os.path.getsize(path) if existed else 0
+            os.replace(tmp_path, path)
+            self.total_bytes += size - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+        return path
+
+    def discard(self, tmp_path):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        # Drop least recently used entries until usage is at most 90% of the
+        # cap. Other worker processes write to the same directory, so the
+        # running total is re-read from disk first.
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        self.total_bytes = sum(size for _, _, size in entries)
+        target = self.max_bytes * 9 // 10
+        for path, _, size in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+
+    def get_or_create(self, key, produce):
+        data = self.get(key)
+        if data is None:
+            data = produce()
+            self.put(key, data)
+        return data
@@ -0,0 +1,40 @@
+"""Gunicorn settings for multi-worker serving.
+
+    gunicorn -c backend/gunicorn_conf.py backend.server:app
+
+The app (and with it the embedding model) is imported once in the master
+before workers are forked, so model weights are shared copy-on-write
+instead of being loaded per worker. Session state lives in SQLite and
+FAISS segments are memory-mapped, so workers share both. Workers write
+metric snapshots to METRICS_MULTIPROC_DIR, so /metrics covers all of them.
+"""
+import os
+import shutil
+
+# Set before the app is preloaded, so backend/metrics.py picks it up.
+METRICS_DIR = os.environ.setdefault("METRICS_MULTIPROC_DIR", "metrics_multiproc")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 600
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Snapshots of a previous run's workers would be added to this run's.
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # Split intra-op threads between workers so N workers don't each spin up
+    # cpu_count torch/OpenMP threads and oversubscribe the host.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import faiss
+    faiss.omp_set_num_threads(threads)
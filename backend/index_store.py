@@ -0,0 +1,610 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+import faiss
+import numpy as np
+
+# Session indexes are stored as a directory of immutable segments plus a small
+# manifest. Appends write one new segment; a background compaction merges
+# small segments once there are more than MAX_SEGMENTS of them.
+SEGMENTS_DIRNAME = "mysession_segments"
+MANIFEST_NAME = "manifest.json"
+MAX_SEGMENTS = int(os.getenv("INDEX_MAX_SEGMENTS", "8"))
+COMPACT_MAX_ROWS = int(os.getenv("INDEX_COMPACT_MAX_ROWS", "50000"))
+# Segments are immutable, so they are memory-mapped by default: every server
+# worker then shares the same page-cache pages instead of a private copy.
+READ_FLAGS = (faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+              if os.getenv("INDEX_MMAP", "1") != "0" else 0)
+# Vector encoding of new segments: "flat" (float32, 4 bytes/dim), "fp16"
+# (2 bytes/dim) or "sq8" (1 byte/dim). Existing segments keep their encoding
+# until they are compacted or rewritten with ``requantize``.
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "flat")
+# sq8 value ranges are trained once per store and kept in the manifest, so
+# compaction can concatenate the codes of its segments. Until the store has
+# a batch of INDEX_SQ_TRAIN_ROWS vectors to train them on, new segments are
+# written as float32 and get encoded when they are compacted.
+INDEX_SQ_TRAIN_ROWS = int(os.getenv("INDEX_SQ_TRAIN_ROWS", "1000"))
+# Headroom added on each side of the trained ranges, as a fraction of their
+# width, for vectors of documents indexed later.
+SQ_RANGE_MARGIN = 0.1
+# With INDEX_RERANK=1, quantized segments also keep their float32 vectors in a
+# memory-mapped sidecar and the top k * INDEX_RERANK_FACTOR candidates are
+# re-scored exactly. Only the candidates' rows are paged in.
+INDEX_RERANK = os.getenv("INDEX_RERANK", "0") != "0"
+INDEX_RERANK_FACTOR = int(os.getenv("INDEX_RERANK_FACTOR", "4"))
+QUANTIZERS = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+# Cross-process store locks live outside the session folders, which
+# /end-session deletes wholesale.
+INDEX_LOCK_DIR = os.getenv("INDEX_LOCK_DIR", "index_locks")
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class StoreLock:
+    """Re-entrant lock on a store directory, held across processes.
+
+    Threads of one process share a ``threading.RLock``; the outermost holder
+    also takes an exclusive ``flock`` on a file in INDEX_LOCK_DIR named after
+    the store, so server workers writing the same store are serialized too.
+    The lock file is never inside the session folder: deleting that folder
+    would let two processes lock different inodes.
+    """
+
+    def __init__(self, root):
+        digest = hashlib.sha256(root.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(os.path.abspath(INDEX_LOCK_DIR),
+                                 f"{os.path.basename(root)}-{digest}.lock")
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0 and fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self.thread_lock.release()
+                raise
+            self.fd = fd
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0 and self.fd is not None:
+            fd, self.fd = self.fd, None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self.thread_lock.release()
+
+
+def _store_lock(root):
+    with _locks_guard:
+        root = os.path.abspath(root)
+        if root not in _locks:
+            _locks[root] = StoreLock(root)
+        return _locks[root]
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _temp_path(path):
+    """Unique temp file next to ``path``, so concurrent writers never share
+    one and ``os.replace`` stays on the same filesystem."""
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.",
+                                    suffix=".tmp", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    return tmp_path
+
+
+def _replace(tmp_path, path):
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _fsync_dir(os.path.dirname(path) or ".")
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    tmp_path = _temp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    _replace(tmp_path, path)
+
+
+def atomic_write_vectors(vectors, path):
+    tmp_path = _temp_path(path)
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors)
+        f.flush()
+        os.fsync(f.fileno())
+    _replace(tmp_path, path)
+
+
+def build_index(vectors, quantization="flat", ranges=None):
+    """Inner-product index over ``vectors`` using the given encoding.
+
+    Scalar quantizers use the trained value ``ranges`` when given, so codes
+    of indexes built with the same ranges can be merged; otherwise the
+    ranges are learned from ``vectors``.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if quantization != "flat" and quantization not in QUANTIZERS:
+        raise ValueError(f"unknown index quantization {quantization!r}, "
+                         f"expected one of: flat, {', '.join(QUANTIZERS)}")
+    if quantization == "flat" or len(vectors) == 0:
+        index = faiss.IndexFlatIP(vectors.shape[1])
+    else:
+        index = faiss.IndexScalarQuantizer(vectors.shape[1], QUANTIZERS[quantization],
+                                           faiss.METRIC_INNER_PRODUCT)
+        index.sq.rangestat_arg = SQ_RANGE_MARGIN
+        if ranges is not None:
+            faiss.copy_array_to_vector(np.asarray(ranges, dtype="float32"), index.sq.trained)
+            index.is_trained = True
+        elif not index.is_trained:
+            index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def needs_training(quantization):
+    """True for scalar quantizers that learn value ranges (sq8, not fp16)."""
+    return not faiss.IndexScalarQuantizer(1, QUANTIZERS[quantization]).is_trained
+
+
+def sq_ranges(index):
+    """Trained value ranges of a scalar-quantized index (empty for fp16)."""
+    return faiss.vector_to_array(index.sq.trained)
+
+
+class RerankedSegment:
+    """Quantized segment whose top candidates are re-scored against the
+    exact float32 vectors."""
+
+    def __init__(self, index, vectors, factor=INDEX_RERANK_FACTOR):
+        self.index = index
+        self.vectors = vectors
+        self.factor = factor
+        self.ntotal = index.ntotal
+        self.d = index.d
+
+    def search(self, queries, k):
+        D, I = self.index.search(queries, min(self.ntotal, k * self.factor))
+        # Sorted ids give the memory-mapped sidecar a sequential access pattern.
+        ids = np.unique(I[I >= 0])
+        if ids.size == 0:
+            return D[:, :k], I[:, :k]
+        rows = np.asarray(self.vectors[ids], dtype="float32")
+        pos = np.searchsorted(ids, np.maximum(I, 0))
+        exact = np.einsum("nkd,nd->nk", rows[pos], queries)
+        exact = np.where(I >= 0, exact, -np.inf).astype("float32")
+        order = np.argsort(-exact, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(exact, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+
+def atomic_write_index(index, path):
+    tmp_path = _temp_path(path)
+    faiss.write_index(index, tmp_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    _replace(tmp_path, path)
+
+
+class SegmentedIndex:
+    """Read-only view that searches several FAISS segments as one index.
+
+    ``search`` returns ``(scores, ids)`` arrays shaped like ``faiss.Index.search``
+    with ids numbered across segments in manifest order, padded with -1.
+    """
+
+    def __init__(self, segments, dim):
+        self.segments = segments
+        self.d = dim
+        self.offsets = []
+        total = 0
+        for seg in segments:
+            self.offsets.append(total)
+            total += seg.ntotal
+        self.ntotal = total
+
+    def search(self, queries, k):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        n = queries.shape[0]
+        scores, ids = [], []
+        for seg, offset in zip(self.segments, self.offsets):
+            if seg.ntotal == 0:
+                continue
+            D, I = seg.search(queries, min(k, seg.ntotal))
+            scores.append(D)
+            ids.append(np.where(I >= 0, I + offset, -1))
+        if not scores:
+            return (np.full((n, k), -np.inf, dtype="float32"),
+                    np.full((n, k), -1, dtype="int64"))
+        D = np.hstack(scores)
+        I = np.hstack(ids)
+        if len(scores) > 1:
+            order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+            D = np.take_along_axis(D, order, axis=1)
+            I = np.take_along_axis(I, order, axis=1)
+        if D.shape[1] < k:
+            pad = k - D.shape[1]
+            D = np.hstack([D, np.full((n, pad), -np.inf, dtype=D.dtype)])
+            I = np.hstack([I, np.full((n, pad), -1, dtype=I.dtype)])
+        return D, I
+
+
+class SegmentStore:
+    """Append-only, crash-safe storage for one session's vectors and metadata.
+
+    Every file is written to a temp path and renamed into place; the manifest
+    is replaced last, so a crash leaves either the old or the new state.
+    Writers hold ``self.lock`` (a StoreLock) for the whole read-modify-write
+    of the manifest, which serializes them across threads and processes.
+    """
+
+    def __init__(self, root, quantization=INDEX_QUANTIZATION, rerank=INDEX_RERANK):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self.lock = _store_lock(root)
+        self.quantization = quantization
+        self.rerank = rerank
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def stamp(self):
+        """Cheap change marker for the manifest (None when there is no index)."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def read_manifest(self):
+        if not self.exists():
+            return {"next_id": 1, "segments": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _paths(self, name):
+        return (os.path.join(self.root, f"{name}.faiss"),
+                os.path.join(self.root, f"{name}.json"))
+
+    def _vectors_path(self, name):
+        return os.path.join(self.root, f"{name}.f32.npy")
+
+    def _store_ranges(self, manifest):
+        """Trained ranges of the store's quantizer, or None before training."""
+        ranges = manifest.get("sq_ranges", {}).get(self.quantization)
+        return None if ranges is None else np.asarray(ranges, dtype="float32")
+
+    def _untrained(self, manifest):
+        return (self.quantization != "flat" and needs_training(self.quantization)
+                and self._store_ranges(manifest) is None)
+
+    def _encode(self, manifest, vectors):
+        """Index of ``vectors`` in the store's encoding using its trained
+        ranges, training and recording them in ``manifest`` on the first
+        batch that is large enough. Returns None when ``vectors`` must stay
+        float32 because the ranges cannot be trained yet."""
+        if self.quantization == "flat" or len(vectors) == 0:
+            return build_index(vectors)
+        if self._untrained(manifest) and len(vectors) < INDEX_SQ_TRAIN_ROWS:
+            return None
+        ranges = self._store_ranges(manifest)
+        index = build_index(vectors, self.quantization, ranges)
+        if ranges is None:
+            self._record_ranges(manifest, index)
+        return index
+
+    def _record_ranges(self, manifest, index):
+        manifest.setdefault("sq_ranges", {})[self.quantization] = sq_ranges(index).tolist()
+
+    def _codes_match(self, manifest, seg, index):
+        """True when ``index`` already holds codes the store would write."""
+        quantization = seg.get("quantization", "flat")
+        if quantization != self.quantization:
+            return False
+        if quantization == "flat":
+            return True
+        ranges = self._store_ranges(manifest)
+        own = sq_ranges(index)
+        if ranges is None:
+            return own.size == 0
+        return np.array_equal(own, ranges)
+
+    def _write_segment(self, manifest, vectors, metadata, index=None, exact=True):
+        """Write one segment. ``index`` (already in the store's encoding) is
+        written as is; otherwise it is built from ``vectors``. ``vectors``
+        are only needed then, or for the INDEX_RERANK sidecar, which is not
+        written when they are decoded codes (``exact=False``)."""
+        name = f"seg-{manifest['next_id']:06d}"
+        index_path, meta_path = self._paths(name)
+        if vectors is not None:
+            vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if index is None:
+            index = self._encode(manifest, vectors)
+        if index is None:
+            index = build_index(vectors)
+        atomic_write_index(index, index_path)
+        seg = {"name": name, "count": len(metadata),
+               "documents": sorted({m["document"] for m in metadata})}
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            seg["quantization"] = self.quantization
+            if self.rerank and exact:
+                atomic_write_vectors(vectors, self._vectors_path(name))
+                seg["float32"] = True
+        atomic_write_json(meta_path, metadata)
+        manifest["next_id"] += 1
+        return seg
+
+    def _remove_segment_files(self, seg):
+        for path in (*self._paths(seg["name"]), self._vectors_path(seg["name"])):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _exact_vectors(self, seg, index):
+        """Original float32 vectors of a segment (its sidecar, or a flat
+        index), or None when only quantized codes are left."""
+        if seg.get("float32"):
+            return np.load(self._vectors_path(seg["name"]))
+        if "quantization" not in seg:
+            return index.reconstruct_n(0, index.ntotal)
+        return None
+
+    def _segment_vectors(self, seg, index):
+        """Best available float32 vectors of a segment: the exact ones when
+        they exist, otherwise the (lossy) decoded index."""
+        vectors = self._exact_vectors(seg, index)
+        return index.reconstruct_n(0, index.ntotal) if vectors is None else vectors
+
+    def version(self):
+        """Content version of the index: changes when documents are added,
+        but not when segments are compacted."""
+        manifest = self.read_manifest()
+        docs = sorted(doc for seg in manifest["segments"] for doc in seg["documents"])
+        total = sum(seg["count"] for seg in manifest["segments"])
+        return hashlib.sha256(json.dumps([total, docs]).encode("utf-8")).hexdigest()[:16]
+
+    def documents(self):
+        manifest = self.read_manifest()
+        return {doc for seg in manifest["segments"] for doc in seg["documents"]}
+
+    def append(self, embeddings, sections):
+        """Write ``sections`` and their vectors as one new segment.
+
+        Cost is proportional to the new data plus the manifest size.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            manifest = self.read_manifest()
+            manifest.setdefault("dim", embeddings.shape[1])
+            manifest["segments"].append(self._write_segment(manifest, embeddings, sections))
+            atomic_write_json(self.manifest_path, manifest, indent=2)
+            needs_compaction = len(manifest["segments"]) > MAX_SEGMENTS
+        if needs_compaction:
+            threading.Thread(target=self.compact, daemon=True).start()
+        return len(sections)
+
+    def _load_segments(self, manifest):
+        indexes, metadata = [], []
+        for seg in manifest["segments"]:
+            index_path, meta_path = self._paths(seg["name"])
+            index = faiss.read_index(index_path, READ_FLAGS)
+            if self.rerank and seg.get("float32"):
+                index = RerankedSegment(index, np.load(self._vectors_path(seg["name"]), mmap_mode="r"))
+            indexes.append(index)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata.extend(json.load(f))
+        return indexes, metadata
+
+    def load(self, dim=None):
+        """Return ``(SegmentedIndex, metadata)`` for the current manifest."""
+        for attempt in range(2):
+            manifest = self.read_manifest()
+            try:
+                indexes, metadata = self._load_segments(manifest)
+                break
+            except FileNotFoundError:
+                # A compaction swapped the manifest while we were reading.
+                if attempt:
+                    raise
+        return SegmentedIndex(indexes, manifest.get("dim", dim)), metadata
+
+    def _merge_parts(self, manifest, parts):
+        """One index in the store's encoding holding every part's vectors,
+        or None while the store has no trained ranges to encode them with.
+
+        Parts whose codes already match are concatenated with ``merge_from``;
+        the others are encoded from their exact vectors.
+        """
+        if self._untrained(manifest):
+            return None
+        merged = None
+        for seg, index, vectors in parts:
+            if not self._codes_match(manifest, seg, index):
+                index = self._encode(manifest, vectors)
+            if merged is None:
+                merged = index
+            else:
+                merged.merge_from(index)
+        return merged
+
+    def compact(self):
+        """Merge small segments into one and drop the merged files.
+
+        Quantized segments whose codes do not match the store's encoding and
+        that have no float32 sidecar are left as they are: rebuilding them
+        from their decoded codes would add quantization error.
+        """
+        with self.lock:
+            manifest = self.read_manifest()
+            wants_float32 = self.rerank and self.quantization != "flat"
+            parts = []
+            for seg in manifest["segments"]:
+                if seg["count"] >= COMPACT_MAX_ROWS:
+                    continue
+                index = faiss.read_index(self._paths(seg["name"])[0])
+                vectors = self._exact_vectors(seg, index)
+                if vectors is None and (wants_float32 or not self._codes_match(manifest, seg, index)):
+                    continue
+                parts.append((seg, index, vectors))
+            if len(parts) < 2:
+                return
+            small = [seg for seg, _, _ in parts]
+            metadata = []
+            for seg in small:
+                with open(self._paths(seg["name"])[1], "r", encoding="utf-8") as f:
+                    metadata.extend(json.load(f))
+            index = self._merge_parts(manifest, parts)
+            vectors = None
+            if index is None or wants_float32:
+                vectors = np.vstack([exact for _, _, exact in parts])
+            new_seg = self._write_segment(manifest, vectors, metadata, index)
+            # The merged segment takes the slot of the first segment it
+            # replaces; ids are positional, so metadata order follows it.
+            first = manifest["segments"].index(small[0])
+            small_names = {seg["name"] for seg in small}
+            kept = [seg for seg in manifest["segments"] if seg["name"] not in small_names]
+            kept.insert(first, new_seg)
+            manifest["segments"] = kept
+            atomic_write_json(self.manifest_path, manifest, indent=2)
+            for seg in small:
+                self._remove_segment_files(seg)
+            print(f"Compacted {len(small)} index segments into {new_seg['name']}")
+
+    def requantize(self):
+        """Rewrite every segment whose encoding differs from the store's
+        ``quantization``/``rerank`` settings. Returns the number rewritten.
+
+        Going from a quantized segment without a float32 sidecar to another
+        encoding cannot recover the original precision; such a segment is
+        never given a sidecar made of its decoded codes. A store without
+        trained ranges gets them from all of its vectors first.
+        """
+        with self.lock:
+            manifest = self.read_manifest()
+            wants_float32 = self.rerank and self.quantization != "flat"
+            stale = []
+            for i, seg in enumerate(manifest["segments"]):
+                index = faiss.read_index(self._paths(seg["name"])[0])
+                if self._codes_match(manifest, seg, index) and (
+                        not seg.get("float32") or wants_float32):
+                    continue
+                stale.append((i, seg, index))
+            if stale and self._untrained(manifest):
+                sample = np.vstack([self._segment_vectors(seg, index) for _, seg, index in stale])
+                if len(sample):
+                    self._record_ranges(manifest, build_index(sample, self.quantization))
+            for i, seg, index in stale:
+                vectors = self._segment_vectors(seg, index)
+                exact = self._exact_vectors(seg, index) is not None
+                with open(self._paths(seg["name"])[1], "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+                manifest["segments"][i] = self._write_segment(manifest, vectors, metadata,
+                                                              exact=exact)
+            if stale:
+                atomic_write_json(self.manifest_path, manifest, indent=2)
+                for _, seg, _ in stale:
+                    self._remove_segment_files(seg)
+                print(f"Rewrote {len(stale)} index segments as {self.quantization}")
+            return len(stale)
+
+    def size_bytes(self, include_float32=True):
+        """On-disk size of the vector data. Float32 sidecars are only paged in
+        for re-ranked candidates, so they can be left out to estimate RAM."""
+        total = 0
+        for seg in self.read_manifest()["segments"]:
+            paths = [self._paths(seg["name"])[0]]
+            if include_float32:
+                paths.append(self._vectors_path(seg["name"]))
+            for path in paths:
+                if os.path.exists(path):
+                    total += os.path.getsize(path)
+        return total
+
+    def _needs_migration(self, index_path, meta_path):
+        return not self.exists() and os.path.exists(index_path) and os.path.exists(meta_path)
+
+    def migrate_legacy(self, index_path, meta_path):
+        """Import a single-file ``.faiss`` + metadata JSON pair as the first
+        segment. The legacy files are left in place.
+
+        Only an actual migration takes the store lock; readers of an existing
+        store (or of no store at all) return without it.
+        """
+        if not self._needs_migration(index_path, meta_path):
+            return False
+        with self.lock:
+            if not self._needs_migration(index_path, meta_path):
+                return False
+            index = faiss.read_index(index_path)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            os.makedirs(self.root, exist_ok=True)
+            manifest = {"next_id": 1, "dim": index.d, "segments": []}
+            vectors = index.reconstruct_n(0, index.ntotal)
+            manifest["segments"].append(self._write_segment(manifest, vectors, metadata))
+            atomic_write_json(self.manifest_path, manifest, indent=2)
+            print(f"Migrated legacy index {index_path} into {self.root}")
+            return True
+
+
+def store_for(index_path, meta_path):
+    """Segment store living next to the legacy ``index_path`` file, migrating
+    the legacy pair on first use."""
+    store = SegmentStore(os.path.join(os.path.dirname(os.path.abspath(index_path)), SEGMENTS_DIRNAME))
+    store.migrate_legacy(index_path, meta_path)
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rewrite a session index with another vector encoding.")
+    parser.add_argument("index_path", help="Legacy .faiss path of the session, e.g. round1b/mysession_index.faiss")
+    parser.add_argument("--meta_path", help="Metadata JSON next to index_path (default: mysession_metadata.json)")
+    parser.add_argument("--quantization", choices=["flat", *QUANTIZERS], default=INDEX_QUANTIZATION)
+    parser.add_argument("--rerank", action="store_true", default=INDEX_RERANK,
+                        help="Keep float32 sidecars for exact re-ranking")
+    args = parser.parse_args()
+    meta_path = args.meta_path or os.path.join(os.path.dirname(args.index_path), "mysession_metadata.json")
+    store = store_for(args.index_path, meta_path)
+    store.quantization, store.rerank = args.quantization, args.rerank
+    print(f"{store.requantize()} segments rewritten, {store.size_bytes()} bytes of vector data")
@@ -0,0 +1,259 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+try:
+    from .save_pdfs import append_sections, extract_document_sections, session_index_paths
+    from . import metrics
+except ImportError:  # run as a script from backend/
+    from save_pdfs import append_sections, extract_document_sections, session_index_paths
+    import metrics
+
+# Upload bytes are buffered up to this size before a (threaded) disk write.
+WRITE_CHUNK_SIZE = 1024 * 1024
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "2"))
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: the server process is multi-threaded, forking it is unsafe.
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+class UploadError(Exception):
+    pass
+
+
+class _FilePart:
+    def __init__(self, filename, path):
+        self.filename = filename
+        self.path = path
+        self.handle = None
+        self.sha256 = hashlib.sha256()
+        self.buffer = []
+        self.buffered = 0
+        self.size = 0
+        self.complete = False
+
+    def flush(self):
+        # Runs in a worker thread: hashing and disk IO stay off the event loop.
+        if self.handle is None:
+            self.handle = open(self.path, "wb")
+        data = b"".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.sha256.update(data)
+        self.handle.write(data)
+        self.size += len(data)
+
+    def close(self):
+        self.flush()
+        self.handle.close()
+        self.complete = True
+
+    def discard(self):
+        # The upload failed: don't leave this (possibly truncated) PDF behind.
+        if self.handle is None:
+            return
+        self.handle.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class StreamingPDFUpload:
+    """Spool the ``field`` file parts of a multipart body to ``folder`` as
+    they arrive.
+
+    ``on_file(filename, path, digest)`` is called as soon as each file part is
+    complete, while the rest of the request body is still being received.
+    File parts under another field name or without a ``.pdf`` extension are
+    rejected with UploadError. A filename repeated within the upload is saved
+    under a numbered name instead of overwriting the earlier part. When
+    receiving fails, every file of the upload is removed again, complete or
+    not (see :meth:`discard`).
+    """
+
+    def __init__(self, content_type, folder, on_file, field="pdfs"):
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise UploadError("Missing boundary in multipart upload.")
+        self.folder = Path(folder)
+        self.on_file = on_file
+        self.field = field
+        self.filenames = []
+        self._parts = []
+        self._events = []
+        self._part = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def _on_part_begin(self):
+        self._part = None
+        self._disposition = b""
+
+    def _on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _unique_name(self, name):
+        taken = {part.filename for part in self._parts}
+        stem, suffix = os.path.splitext(name)
+        n = 1
+        while name in taken:
+            n += 1
+            name = f"{stem}-{n}{suffix}"
+        return name
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        filename = options.get(b"filename")
+        if filename:
+            field = options.get(b"name", b"").decode("utf-8", errors="replace")
+            if field != self.field:
+                raise UploadError(f"Unexpected file field '{field}', expected '{self.field}'.")
+            name = Path(filename.decode("utf-8", errors="replace")).name
+            if not name.lower().endswith(".pdf"):
+                raise UploadError(f"{name} is not a PDF file.")
+            name = self._unique_name(name)
+            self._part = _FilePart(name, self.folder / name)
+            self._parts.append(self._part)
+
+    def _on_part_data(self, data, start, end):
+        if self._part is not None:
+            self._events.append((self._part, data[start:end]))
+
+    def _on_part_end(self):
+        if self._part is not None:
+            self._events.append((self._part, None))
+
+    async def _drain(self):
+        for part, data in self._events:
+            if data is None:
+                await asyncio.to_thread(part.close)
+                self.filenames.append(part.filename)
+                self.on_file(part.filename, part.path, part.sha256.hexdigest())
+                continue
+            part.buffer.append(data)
+            part.buffered += len(data)
+            if part.buffered >= WRITE_CHUNK_SIZE:
+                await asyncio.to_thread(part.flush)
+        self._events.clear()
+
+    async def receive(self, stream):
+        try:
+            async for chunk in stream:
+                self._parser.write(chunk)
+                await self._drain()
+            self._parser.finalize()
+            await self._drain()
+            for part in self._parts:
+                if not part.complete:
+                    raise UploadError(f"Upload of {part.filename} ended before the file was complete.")
+        except BaseException:
+            await asyncio.to_thread(self.discard)
+            raise
+        if not self.filenames:
+            raise UploadError(f"No PDF files in the '{self.field}' field of the upload.")
+        return self.filenames
+
+    def discard(self):
+        """Remove every file this upload wrote."""
+        for part in self._parts:
+            part.discard()
+
+
+class IngestionJob:
+    """Parse uploaded PDFs in worker processes while the upload continues,
+    then embed and append all new sections to the session index at once."""
+
+    def __init__(self, pdf_folder):
+        self.pdf_folder = pdf_folder
+        self.futures = {}
+        self.aliases = []
+        self.trace_id = metrics.current_trace_id()
+
+    def submit(self, filename, path, digest):
+        if digest in self.futures:
+            # Same bytes as an earlier part: parse once, index under both names.
+            print(f"{filename}: same content already queued in this upload, indexing it as an alias")
+            self.aliases.append((filename, digest))
+            return
+        self.futures[digest] = get_parse_pool().submit(
+            metrics.traced_call, self.trace_id, extract_document_sections, str(path))
+
+    async def abort(self):
+        """Drop the parses of a failed upload. Queued ones are cancelled and
+        running ones waited for, so none outlives the files it reads."""
+        for future in self.futures.values():
+            future.cancel()
+        await asyncio.to_thread(concurrent.futures.wait, list(self.futures.values()))
+
+    async def finish(self, model):
+        results = await asyncio.gather(*map(asyncio.wrap_future, self.futures.values()))
+        parsed = dict(zip(self.futures, results))
+        new_sections = []
+        for sections, observations in parsed.values():
+            metrics.merge_observations(observations)
+            new_sections.extend(sections)
+        for filename, digest in self.aliases:
+            new_sections.extend({**section, "document": filename} for section in parsed[digest][0])
+        index_path, meta_path = session_index_paths(self.pdf_folder)
+        # append_sections serializes writers of the store across processes.
+        return await asyncio.to_thread(
+            append_sections, model, index_path, meta_path, new_sections)
+
+
+async def ingest_upload(request, pdf_folder, model, field="pdfs"):
+    """Stream the ``field`` PDFs of a multipart upload into ``pdf_folder``
+    and index them.
+
+    Returns the list of received filenames. If the upload or the indexing
+    fails, the received files are removed and nothing is indexed.
+    """
+    job = IngestionJob(pdf_folder)
+    upload = StreamingPDFUpload(
+        request.headers.get("content-type", ""), pdf_folder, job.submit, field)
+    try:
+        filenames = await upload.receive(request.stream())
+        await job.finish(model)
+    except BaseException:
+        await job.abort()
+        await asyncio.to_thread(upload.discard)
+        raise
+    return filenames
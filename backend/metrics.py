@@ -0,0 +1,299 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+# Set METRICS_ENABLED=0 to turn every timer into a shared no-op.
+ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Each server worker process has its own registry. With
+# METRICS_MULTIPROC_DIR set (backend/gunicorn_conf.py sets it), every worker
+# writes a snapshot there every METRICS_SNAPSHOT_SECONDS and /metrics sums
+# all snapshots, whichever worker answers the scrape.
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+trace_id_var = contextvars.ContextVar("trace_id", default=None)
+# Observations made inside a worker process, shipped back by traced_call.
+# Per context, so concurrent traced calls in threads or tasks don't mix.
+_worker_observations = contextvars.ContextVar("worker_observations", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id():
+    return trace_id_var.get()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def empty(self):
+        return Counter(self.name, self.help)
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(map(list, key)), value] for key, value in self.values.items()]
+
+    def merge(self, rows):
+        for key, value in rows:
+            key = tuple(map(tuple, key))
+            self.values[key] = self.values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        self._observe_key(_label_key(labels), value)
+
+    def _observe_key(self, key, value):
+        pos = bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[pos] += 1
+            row[-1] += value
+
+    def empty(self):
+        return Histogram(self.name, self.help, self.buckets)
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(map(list, key)), list(row)] for key, row in self.values.items()]
+
+    def merge(self, rows):
+        for key, row in rows:
+            key = tuple(map(tuple, key))
+            total = self.values.get(key)
+            self.values[key] = row if total is None else [a + b for a, b in zip(total, row)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, row in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, row):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                cumulative += row[len(self.buckets)]
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {row[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Time spent per pipeline stage (parse, markdown, segment, embed, index_write, index_load, search, llm, tts).")
+STAGE_ERRORS = Counter("stage_errors_total", "Pipeline stage invocations that raised.")
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by path and status code.")
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by path.")
+ITEMS = Counter("pipeline_items_total", "Items processed per stage (pages, sections, vectors, ...).")
+
+REGISTRY = [STAGE_SECONDS, STAGE_ERRORS, HTTP_REQUESTS, HTTP_SECONDS, ITEMS]
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        record_stage(self.stage, elapsed, failed=exc_type is not None)
+        return False
+
+
+def timed(stage):
+    """Context manager that records the duration of ``stage``."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+
+def record_stage(stage, seconds, failed=False):
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if failed:
+        STAGE_ERRORS.inc(stage=stage)
+    observations = _worker_observations.get()
+    if observations is not None:
+        observations.append(("stage", stage, seconds, failed))
+
+
+def count(stage, amount=1):
+    if not ENABLED:
+        return
+    ITEMS.inc(amount, stage=stage)
+    observations = _worker_observations.get()
+    if observations is not None:
+        observations.append(("count", stage, amount, False))
+
+
+def traced_call(trace_id, fn, *args):
+    """Run ``fn(*args)`` in a worker process under ``trace_id``.
+
+    Returns ``(result, observations)``; pass the observations to
+    :func:`merge_observations` in the parent so worker timings show up on
+    ``/metrics``. With metrics enabled, the call's duration is logged at
+    DEBUG level.
+    """
+    token = trace_id_var.set(trace_id)
+    observations = []
+    observations_token = _worker_observations.set(observations)
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+        if ENABLED:
+            logger.debug("[trace %s] %s%r took %.2fs",
+                         trace_id, fn.__name__, args, time.perf_counter() - start)
+        return result, observations
+    finally:
+        _worker_observations.reset(observations_token)
+        trace_id_var.reset(token)
+
+
+def merge_observations(observations):
+    for kind, stage, value, failed in observations:
+        if kind == "stage":
+            record_stage(stage, value, failed)
+        else:
+            count(stage, value)
+
+
+def snapshot():
+    """This process's metric values, as JSON-serializable data."""
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+def _snapshot_path(pid):
+    return os.path.join(MULTIPROC_DIR, f"metrics-{pid}.json")
+
+
+def write_snapshot():
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+_snapshot_pid = None
+
+
+def start_snapshots():
+    """Write this process's snapshot to METRICS_MULTIPROC_DIR every
+    METRICS_SNAPSHOT_SECONDS. Call once in each server worker; a no-op
+    without METRICS_MULTIPROC_DIR."""
+    global _snapshot_pid
+    if not ENABLED or not MULTIPROC_DIR or _snapshot_pid == os.getpid():
+        return
+    _snapshot_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(SNAPSHOT_SECONDS)
+            try:
+                write_snapshot()
+            except OSError:
+                logger.exception("Could not write the metrics snapshot")
+
+    threading.Thread(target=run, name="metrics-snapshot", daemon=True).start()
+
+
+def _merged_registry():
+    """REGISTRY summed over the snapshots of every worker, this one's fresh.
+
+    Snapshots of exited workers are kept, so totals never go down when a
+    worker is replaced.
+    """
+    write_snapshot()
+    merged = {metric.name: metric.empty() for metric in REGISTRY}
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "metrics-*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, rows in data.items():
+            if name in merged:
+                merged[name].merge(rows)
+    return list(merged.values())
+
+
+def render_metrics():
+    registry = _merged_registry() if MULTIPROC_DIR else REGISTRY
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
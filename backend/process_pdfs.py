@@ -1,28 +1,47 @@
+import multiprocessing
+import multiprocessing.util
 import os
-import re
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .text_utils import BOLD_LINE_RE, MARKDOWN_HEADING_RE, clean_text
+    from .style_analysis import heading_levels, page_headings, page_lines
+    from . import metrics
+except ImportError:  # run as a script from backend/
+    from text_utils import BOLD_LINE_RE, MARKDOWN_HEADING_RE, clean_text
+    from style_analysis import heading_levels, page_headings, page_lines
+    import metrics
 
 try:
     import fitz  # pymupdf
     import pymupdf4llm
     HAS_PYMUPDF = True
+    # "dict" extraction without image payloads; headings only need text.
+    TEXT_FLAGS = fitz.TEXTFLAGS_TEXT
 except ImportError:
     HAS_PYMUPDF = False
 
-def clean_text(text):
-    if not text:
-        return ""
-    text = str(text)
-    text = re.sub(r'[\*_`]', '', text)
-    text = text.replace('–', '-').replace('“', '"').replace('”', '"')
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+# Large PDFs are split into page ranges that are parsed in separate worker
+# processes. Documents shorter than PDF_SHARD_MIN_PAGES stay serial.
+SHARD_MIN_PAGES = int(os.getenv("PDF_SHARD_MIN_PAGES", "64"))
+# Every ingestion parse worker (INGEST_PARSE_WORKERS, see backend/ingest.py)
+# may shard a document at the same time, so each gets an equal share of CPUs.
+_CPU_SHARE = max(1, (os.cpu_count() or 1) // int(os.getenv("INGEST_PARSE_WORKERS", "2")))
+SHARD_WORKERS = min(_CPU_SHARE, int(os.getenv("PDF_SHARD_WORKERS", str(_CPU_SHARE))))
+SHARD_PAGES_PER_WORKER = int(os.getenv("PDF_SHARD_PAGES_PER_WORKER", "16"))
+
+_shard_pool = None
+_shard_pool_size = 0
+_shard_pool_finalizer = None
+_shard_pool_lock = threading.Lock()
 
 def extract_headings_from_markdown(markdown_text, page_num):
     headings = []
     lines = markdown_text.split('\n')
     for line in lines:
-        match = re.match(r'^(#+)\s+(.*)', line.strip())
+        match = MARKDOWN_HEADING_RE.match(line.strip())
         if match:
             level = len(match.group(1))
             text = clean_text(match.group(2))
@@ -35,30 +54,13 @@ def extract_headings_from_markdown(markdown_text, page_num):
             })
     return headings
 
-def extract_headings_from_font_sizes(page, page_num):
-    headings = []
-    blocks = page.get_text("dict")["blocks"]
-    for block in blocks:
-        for line in block.get("lines", []):
-            for span in line.get("spans", []):
-                text = clean_text(span.get("text", ""))
-                size = span.get("size", 0)
-                if text and len(text.split()) < 15 and size > 12: 
-                    headings.append({
-                        "level": "H2",
-                        "text": text,
-                        "page": page_num
-                    })
-    return headings
-
-
 def convert_bold_to_markdown_headings(md_text):
     lines = md_text.split('\n')
     new_lines = []
 
     for line in lines:
         stripped = line.strip()
-        match = re.fullmatch(r"\*\*(.+?)\*\*", stripped)
+        match = BOLD_LINE_RE.fullmatch(stripped)
         if match:
             content = match.group(1).strip()
             if content.endswith(":"):
@@ -102,7 +104,122 @@ def get_best_title(doc):
             return cleaned
     return ""
 
-def process_pdf(pdf_path):
+def scan_pages(doc, page_numbers):
+    """Markdown headings and merged text lines of each page, as a list of
+    ``(page_num, md_headings, PageLines)``. Font-size headings need
+    document-wide statistics, so they are derived later by
+    :func:`assemble_headings`."""
+    scanned = []
+    for i in page_numbers:
+        md_headings = []
+        try:
+            temp_doc = fitz.open()
+            temp_doc.insert_pdf(doc, from_page=i, to_page=i)
+            with metrics.timed("markdown"):
+                md_page = pymupdf4llm.to_markdown(temp_doc, write_images=False)
+            temp_doc.close()
+
+            md = convert_bold_to_markdown_headings(md_page)
+
+            md_headings = extract_headings_from_markdown(md, i)
+        except Exception as e:
+            print("Exception: ", e)
+
+        scanned.append((i, md_headings, page_lines(doc[i], TEXT_FLAGS)))
+    return scanned
+
+
+def assemble_headings(scanned):
+    """Per page, markdown headings followed by font-style headings, with
+    levels judged against the font statistics of the whole document."""
+    line_levels = heading_levels([lines for _, _, lines in scanned])
+    has_headings = any(levels.any() for levels in line_levels)
+    headings = []
+    for (i, md_headings, lines), levels in zip(scanned, line_levels):
+        if has_headings:
+            # Markdown "headings" that are lines in the document's body style
+            # (e.g. whole pages set in bold) are body text, not headings.
+            style_level = dict(zip(lines.texts, levels))
+            md_headings = [h for h in md_headings if style_level.get(h["text"], 1)]
+        headings.extend(md_headings)
+        headings.extend(page_headings(i, lines, levels))
+    return headings
+
+
+def extract_headings_from_pages(doc, page_numbers):
+    return assemble_headings(scan_pages(doc, page_numbers))
+
+
+def _scan_page_range(pdf_path, start, stop):
+    # Runs in a worker process; each worker opens its own handle since fitz
+    # documents cannot be shared across processes.
+    doc = fitz.open(pdf_path)
+    try:
+        return scan_pages(doc, range(start, stop))
+    finally:
+        doc.close()
+
+
+def shard_worker_count(page_count):
+    if page_count < SHARD_MIN_PAGES or SHARD_WORKERS < 2:
+        return 1
+    return max(1, min(SHARD_WORKERS, page_count // SHARD_PAGES_PER_WORKER))
+
+
+def page_ranges(page_count, shards):
+    step, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for n in range(shards):
+        stop = start + step + (1 if n < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def get_shard_pool(workers):
+    """Process pool for page shards, reused across documents.
+
+    Uses spawn like the ingestion parse pool, whose workers call this. The
+    pool only grows when more than its current size is requested, which in
+    the server happens once.
+    """
+    global _shard_pool, _shard_pool_size, _shard_pool_finalizer
+    with _shard_pool_lock:
+        if _shard_pool is None or _shard_pool_size < workers:
+            if _shard_pool_finalizer is not None:
+                _shard_pool_finalizer()
+            _shard_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _shard_pool_size = workers
+            # Inside a parse worker, multiprocessing joins child processes at
+            # exit before the executor's own exit hook would stop them; shut
+            # the pool down first so the worker can exit.
+            _shard_pool_finalizer = multiprocessing.util.Finalize(
+                _shard_pool, _shard_pool.shutdown, exitpriority=20)
+        return _shard_pool
+
+
+def extract_headings_sharded(pdf_path, page_count, workers):
+    ranges = page_ranges(page_count, workers)
+    pool = get_shard_pool(len(ranges))
+    trace_id = metrics.current_trace_id()
+    futures = [pool.submit(metrics.traced_call, trace_id,
+                           _scan_page_range, pdf_path, start, stop)
+               for start, stop in ranges]
+    # Collect in page order so the (text, page) dedup keeps the same
+    # first occurrence as the serial path.
+    scanned = []
+    for future in futures:
+        pages, observations = future.result()
+        metrics.merge_observations(observations)
+        scanned.extend(pages)
+    # Heading levels are decided once, from the merged statistics.
+    return assemble_headings(scanned)
+
+
+def process_pdf(pdf_path, workers=None):
     filename = os.path.basename(pdf_path)
     doc = fitz.open(pdf_path)
     outline = []
@@ -118,23 +235,13 @@ def process_pdf(pdf_path):
     #             "page": page_index
     #         })
     # else:
-    all_headings = []
-
-    for i, page in enumerate(doc):
-        try:
-            temp_doc = fitz.open()
-            temp_doc.insert_pdf(doc, from_page=i, to_page=i)
-            md_page = pymupdf4llm.to_markdown(temp_doc, write_images=False)
-            temp_doc.close()
-
-            md = convert_bold_to_markdown_headings(md_page)
-
-            md_headings = extract_headings_from_markdown(md, i)
-            all_headings.extend(md_headings)
-        except Exception as e:
-            print("Exception: ", e)
-
-        all_headings.extend(extract_headings_from_font_sizes(doc[i], i))
+    metrics.count("pages", doc.page_count)
+    if workers is None:
+        workers = shard_worker_count(doc.page_count)
+    if workers > 1:
+        all_headings = extract_headings_sharded(pdf_path, doc.page_count, workers)
+    else:
+        all_headings = extract_headings_from_pages(doc, range(doc.page_count))
     seen = set()
     for h in all_headings:
         key = (h['text'], h['page'])
@@ -162,7 +269,8 @@ def main_process_pdf(pdf_path):
         sys.exit(0)
     
     try:
-        result = process_pdf(pdf_path)
+        with metrics.timed("parse"):
+            result = process_pdf(pdf_path)
         return result
     except Exception as e:
         print(f"Error with {pdf_path}: {e}", file=sys.stderr)
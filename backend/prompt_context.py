@@ -0,0 +1,140 @@
+import json
+import os
+
+# Rough budgets in tokens (~4 characters per token for English prose).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKENS", "1500"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKENS", "800"))
+SELECTED_TEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_SELECTED_TEXT_TOKENS", "500"))
+RECENT_TURNS = int(os.getenv("PROMPT_RECENT_TURNS", "4"))
+# Older turns are summarized in fixed blocks so that, once written, a block's
+# text never changes. That keeps the prompt prefix identical across turns of
+# the same chat and lets the LLM's prefix cache reuse it.
+HISTORY_BLOCK_TURNS = 4
+# When the condensed history outgrows its share of the budget, the oldest
+# blocks are evicted in steps of 1/HISTORY_EVICT_STEPS of that share, counted
+# from the start of the chat: the cut points never move, so the prefix only
+# changes every few blocks, and what remains is never emptied at once.
+HISTORY_EVICT_STEPS = 2
+SUMMARY_CHARS_PER_TURN = 160
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def _chunk_key(chunk):
+    return " ".join(str(chunk.get("snippet", "")).split()).rstrip(".").lower()
+
+
+def pack_chunks(chunks, budget=CONTEXT_TOKEN_BUDGET):
+    """Format the highest-scoring unique chunks as compact numbered lines.
+
+    Chunks are the dicts returned by ``get_relevant_pages``; duplicates (same
+    normalized snippet) are dropped and packing stops at ``budget`` tokens.
+    """
+    ranked = sorted(chunks, key=lambda c: c.get("score") or 0.0, reverse=True)
+    lines, seen, used = [], set(), 0
+    for chunk in ranked:
+        key = _chunk_key(chunk)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        line = (f"[{len(lines) + 1}] {chunk.get('pdfName')} p.{chunk.get('pageNo')}"
+                f" | {chunk.get('title', '')}: {' '.join(str(chunk.get('snippet', '')).split())}")
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            if not lines:
+                lines.append(truncate_to_tokens(line, budget))
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def _summarize_turn(turn):
+    user = " ".join(str(turn.get("user", "")).split())
+    assistant = " ".join(str(turn.get("assistant", "")).split())
+    half = SUMMARY_CHARS_PER_TURN // 2
+    if len(user) > half:
+        user = user[:half].rsplit(" ", 1)[0] + "…"
+    if len(assistant) > half:
+        assistant = assistant[:half].rsplit(" ", 1)[0] + "…"
+    return f"- Q: {user} / A: {assistant}"
+
+
+def _format_turn(turn):
+    return f"User: {turn.get('user', '')}\nAssistant: {turn.get('assistant', '')}"
+
+
+def _recent_text(turns, budget):
+    # Newest turns first: whole turns are dropped from the oldest end and
+    # only the oldest turn that is kept may be truncated.
+    kept, used = [], 0
+    for turn in reversed(turns):
+        text = _format_turn(turn)
+        cost = estimate_tokens(text) + (1 if kept else 0)
+        if used + cost > budget:
+            remaining = budget - used - (1 if kept else 0)
+            if remaining > 0:
+                kept.append(truncate_to_tokens(text, remaining))
+            break
+        kept.append(text)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+def build_history(history, budget=HISTORY_TOKEN_BUDGET, recent_turns=RECENT_TURNS):
+    """Render chat history within ``budget`` tokens.
+
+    The last ``recent_turns`` turns are kept verbatim, newest first: when they
+    exceed their budget, the oldest of them are dropped. Older turns are
+    condensed to one line each, in blocks of HISTORY_BLOCK_TURNS that stay
+    byte-identical as the chat grows. The condensed part has a fixed third
+    of the budget; when it overflows, the oldest blocks are evicted in
+    fixed token steps, so the prefix stays stable in between.
+    """
+    if not history:
+        return ""
+    # Older turns are cut on block boundaries so summaries never shift.
+    split = max(0, len(history) - recent_turns)
+    split -= split % HISTORY_BLOCK_TURNS
+    older, recent = history[:split], history[split:]
+
+    summary_budget = budget // 3 if older else 0
+    recent_text = _recent_text(recent, budget - summary_budget)
+
+    blocks = []
+    for start in range(0, len(older), HISTORY_BLOCK_TURNS):
+        block = older[start:start + HISTORY_BLOCK_TURNS]
+        blocks.append("\n".join(_summarize_turn(t) for t in block))
+    # Block i covers tokens [starts[i], starts[i + 1]) of the condensed text.
+    starts = [0]
+    for block in blocks:
+        starts.append(starts[-1] + estimate_tokens(block) + 1)
+    step = max(1, summary_budget // HISTORY_EVICT_STEPS)
+    cut, evicted = 0, 0
+    while starts[-1] - starts[evicted] > summary_budget:
+        cut += step
+        while evicted < len(blocks) and starts[evicted + 1] <= cut:
+            evicted += 1
+    blocks = blocks[evicted:]
+
+    parts = []
+    if blocks:
+        parts.append("Earlier conversation (condensed):\n" + "\n".join(blocks))
+    if recent_text:
+        parts.append(recent_text)
+    return "\n\n".join(parts)
+
+
+def compact_json(data, budget=CONTEXT_TOKEN_BUDGET):
+    """Serialize ``data`` without indentation, truncated to ``budget`` tokens."""
+    return truncate_to_tokens(json.dumps(data, ensure_ascii=False, separators=(",", ":")), budget)
@@ -1,36 +1,68 @@
-import faiss
 import json
-from sentence_transformers import SentenceTransformer
+import os
+import threading
 from pathlib import Path
 import argparse
 import numpy as np
 
+try:
+    from .index_store import store_for
+    from . import metrics
+    from .batching import MicroBatcher
+except ImportError:  # run as a script from backend/
+    from index_store import store_for
+    import metrics
+    from batching import MicroBatcher
+
 INDEX_PATH = Path("round1b") / "mysession_index.faiss"
 MAPPING_PATH = Path("round1b") / "mysession_metadata.json"
 
-model = SentenceTransformer("intfloat/e5-base-v2")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "intfloat/e5-base-v2")
 
+model = None
 
-def get_relevant_pages(query_text: str, top_k: int = 5):
-    if not INDEX_PATH.exists() or not MAPPING_PATH.exists():
-        raise FileNotFoundError("FAISS index or metadata file not found.")
 
-    index = faiss.read_index(str(INDEX_PATH))
+def get_model():
+    """Return the process-wide query embedding model, loading it on first use."""
+    global model
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return model
 
-    with open(MAPPING_PATH, "r", encoding="utf-8") as f:
-        index_mapping = json.load(f)
 
-    query_embedding = model.encode([query_text], normalize_embeddings=True)
-    query_embedding = np.array(query_embedding).astype("float32")
+def set_model(embedding_model):
+    """Install an already-loaded embedding model (or a benchmark stand-in)."""
+    global model
+    model = embedding_model
 
-    search_k = top_k * 3
-    scores, indices = index.search(query_embedding, search_k)
 
+_index_cache = {"stamp": None, "index": None, "metadata": None}
+_index_cache_lock = threading.Lock()
+
+
+def load_session_index():
+    """Return the (index, metadata) pair, reloading only when the manifest
+    changed. Segments are memory-mapped, so the vectors are shared between
+    worker processes through the page cache."""
+    store = store_for(INDEX_PATH, MAPPING_PATH)
+    stamp = store.stamp()
+    if stamp is None:
+        raise FileNotFoundError("FAISS index or metadata file not found.")
+    with _index_cache_lock:
+        if _index_cache["stamp"] != stamp:
+            with metrics.timed("index_load"):
+                index, metadata = store.load()
+            _index_cache.update(stamp=stamp, index=index, metadata=metadata)
+        return _index_cache["index"], _index_cache["metadata"]
+
+
+def format_results(query_text, scores_row, indices_row, index_mapping, top_k):
     results = []
     seen_snippets = set()
     selected_text_normalized = " ".join(query_text.strip().split())
 
-    for idx, score in zip(indices[0], scores[0]):
+    for idx, score in zip(indices_row, scores_row):
         if 0 <= idx < len(index_mapping):
             entry = index_mapping[idx]
             snippet = entry.get("content", "").strip()
@@ -48,11 +80,50 @@ def get_relevant_pages(query_text: str, top_k: int = 5):
             break
 
     results.sort(key=lambda x: x["score"], reverse=True)
+    return results
+
+
+def get_relevant_pages_batch(queries):
+    """Answer several ``(query_text, top_k)`` pairs with one encode call and
+    one FAISS search per distinct ``top_k``.
 
+    Each query is searched at its own depth: re-ranked quantized segments
+    pick their candidates from ``k``, so a deeper search could change them.
+    """
+    index, index_mapping = load_session_index()
+    texts = [query_text for query_text, _ in queries]
+
+    with metrics.timed("embed"):
+        query_embeddings = get_model().encode(texts, normalize_embeddings=True)
+    query_embeddings = np.array(query_embeddings).astype("float32")
+    metrics.count("query_batches")
+    metrics.count("batched_queries", len(texts))
+
+    results = [None] * len(queries)
+    for top_k in sorted({top_k for _, top_k in queries}):
+        rows = [i for i, (_, k) in enumerate(queries) if k == top_k]
+        with metrics.timed("search"):
+            scores, indices = index.search(query_embeddings[rows], top_k * 3)
+        for row, i in enumerate(rows):
+            results[i] = format_results(queries[i][0], scores[row], indices[row], index_mapping, top_k)
+    return results
+
+
+def get_relevant_pages(query_text: str, top_k: int = 5):
+    results = get_relevant_pages_batch([(query_text, top_k)])[0]
     print("Top results:", json.dumps(results, indent=2, ensure_ascii=False))
     return results
 
 
+_query_batcher = MicroBatcher(get_relevant_pages_batch)
+
+
+async def get_relevant_pages_async(query_text: str, top_k: int = 5):
+    """Like :func:`get_relevant_pages`, but coalesces concurrent callers into
+    one batched embedding + search (see backend/batching.py)."""
+    return await _query_batcher.submit((query_text, top_k))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--query", type=str, required=True)
@@ -0,0 +1,276 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import faiss
+import fitz
+import numpy as np
+
+try:
+    from .process_pdfs import main_process_pdf
+    from .segmentation import section_headings, segment_sections
+    from .text_utils import combine_lines_bulk
+    from . import metrics
+except ImportError:  # run as a script from backend/
+    from process_pdfs import main_process_pdf
+    from segmentation import section_headings, segment_sections
+    from text_utils import combine_lines_bulk
+    import metrics
+
+# Persona/job extraction over a set of PDFs. The server runs it in-process on
+# a warm model; backend/main.py is the command-line wrapper.
+ROLE_TASK_MODEL_NAME = os.getenv("ROLE_TASK_MODEL", "intfloat/e5-small-v2")
+ROLE_TASK_WORKERS = int(os.getenv("ROLE_TASK_WORKERS", "2"))
+# Parsed sections of recently used PDFs, keyed by (path, size, mtime).
+ROLE_TASK_CACHE_DOCS = int(os.getenv("ROLE_TASK_CACHE_DOCS", "64"))
+TOP_K = 25
+
+model = None
+_model_lock = threading.Lock()
+_rank_pool = None
+_rank_pool_lock = threading.Lock()
+_sections_cache = OrderedDict()
+_sections_cache_lock = threading.Lock()
+
+
+def get_model():
+    """Return the process-wide role-task embedding model, loading it once."""
+    global model
+    with _model_lock:
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(ROLE_TASK_MODEL_NAME)
+        return model
+
+
+def set_model(embedding_model):
+    """Install an already-loaded embedding model (or a benchmark stand-in)."""
+    global model
+    model = embedding_model
+
+
+def get_rank_pool():
+    global _rank_pool
+    with _rank_pool_lock:
+        if _rank_pool is None:
+            _rank_pool = ThreadPoolExecutor(max_workers=ROLE_TASK_WORKERS, thread_name_prefix="role-task")
+        return _rank_pool
+
+
+def extract_sections_from_pdf(pdf_path, all_headings):
+    filename = os.path.basename(pdf_path)
+    headings_list = all_headings.get(filename, [])
+    if not headings_list:
+        return []
+
+    doc = fitz.open(pdf_path)
+    page_texts = [page.get_text() for page in doc]
+    doc.close()
+
+    return segment_sections(page_texts, headings_list)
+
+
+def extract_pdf_sections(pdf_path):
+    """Parse one PDF into role-task sections.
+
+    Returns None when the PDF yields no headings. Safe to run in a worker
+    process.
+    """
+    filename = os.path.basename(pdf_path)
+    extracted_headings = main_process_pdf(pdf_path)
+    if not extracted_headings:
+        return None
+    headings = section_headings(extracted_headings["outline"])
+    sections = extract_sections_from_pdf(pdf_path, {filename: headings})
+    for section in sections:
+        section["document"] = filename
+    return sections
+
+
+def _cache_key(pdf_path):
+    st = os.stat(pdf_path)
+    return (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns)
+
+
+def cached_sections(pdf_path):
+    """Return ``(hit, sections)`` from the parsed-PDF cache."""
+    key = _cache_key(pdf_path)
+    with _sections_cache_lock:
+        if key in _sections_cache:
+            _sections_cache.move_to_end(key)
+            return True, _sections_cache[key]
+    return False, None
+
+
+def cache_sections(pdf_path, sections):
+    key = _cache_key(pdf_path)
+    with _sections_cache_lock:
+        _sections_cache[key] = sections
+        _sections_cache.move_to_end(key)
+        while len(_sections_cache) > ROLE_TASK_CACHE_DOCS:
+            _sections_cache.popitem(last=False)
+
+
+def build_faiss_index(model, sections):
+    metadata = []
+    texts = []
+
+    for section in sections:
+        full_text = f"{section['document']} {section['title']} {section['content']}"
+        if len(full_text.strip()) < 30:
+            continue
+        texts.append(full_text)
+        metadata.append(section)
+
+    if not texts:
+        return None, []
+
+    with metrics.timed("embed"):
+        embeddings = model.encode(texts, normalize_embeddings=True)
+    embeddings = np.array(embeddings).astype('float32')
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+    return index, metadata
+
+
+def query_faiss_index(model, index, metadata, query_text, top_k=TOP_K):
+    query_embedding = model.encode(query_text, normalize_embeddings=True)
+    with metrics.timed("search"):
+        D, I = index.search(np.array([query_embedding]).astype('float32'), top_k)
+
+    results = []
+    for i, idx in enumerate(I[0]):
+        if idx < 0:
+            continue
+        section = metadata[idx]
+        score = D[0][i]
+        results.append((score, section))
+
+    results.sort(key=lambda x: -x[0])
+
+    return results
+
+
+def empty_output(persona, job, input_documents):
+    return {
+        "metadata": {
+            "input_documents": input_documents,
+            "persona": persona,
+            "job_to_be_done": job,
+            "processing_timestamp": datetime.now().isoformat()
+        },
+        "extracted_sections": [],
+        "subsection_analysis": []
+    }
+
+
+def rank_sections(model, persona, job, parsed, num_results=5):
+    """Build the role-task result from ``parsed``: ``(filename, sections)``
+    pairs in input order, where sections is None for an unparseable PDF."""
+    query_text = f"{persona} {job}"
+    input_documents = []
+    all_sections = []
+    for filename, sections in parsed:
+        if sections is None:
+            # Same as the batch tool: a PDF without headings aborts the run.
+            return empty_output(persona, job, [name for name, _ in parsed])
+        # Sections may be shared through the parse cache; don't mutate them.
+        all_sections.extend(sections)
+        input_documents.append(filename)
+        print(f"Processed {filename}: {len(sections)} sections")
+
+    if not all_sections:
+        print("No content found.")
+        return empty_output(persona, job, input_documents)
+
+    index, metadata = build_faiss_index(model, all_sections)
+    if not index:
+        print("Nothing to index.")
+        return empty_output(persona, job, input_documents)
+
+    top_sections = query_faiss_index(model, index, metadata, query_text)
+
+    extracted_sections = []
+    subsection_analysis = []
+
+    refined = combine_lines_bulk([section["content"] for _, section in top_sections])
+    top_sections = [(score, section, text) for (score, section), text
+                    in zip(top_sections, refined) if len(text) > 10]
+    for rank, (score, section, text) in enumerate(top_sections, 1):
+        extracted_sections.append({
+            "document": section["document"],
+            "section_title": section["title"],
+            "importance_rank": rank,
+            "page_number": section["page"]+1
+        })
+
+        subsection_analysis.append({
+            "document": section["document"],
+            "refined_text": section["title"]+" - " + text,
+            "page_number": section["page"]+1
+        })
+
+    output = empty_output(persona, job, input_documents)
+    output["extracted_sections"] = extracted_sections[:num_results]
+    output["subsection_analysis"] = subsection_analysis[:num_results]
+    return output
+
+
+def run_role_task(persona, job, pdf_paths, model, num_results=5):
+    """Serial, uncached role task (used by the command-line tool)."""
+    parsed = []
+    for path in pdf_paths:
+        filename = os.path.basename(path)
+        if not os.path.exists(path):
+            print(f"Missing: {filename}")
+            continue
+        try:
+            parsed.append((filename, extract_pdf_sections(str(path))))
+        except Exception as e:
+            print(f"Error with {filename} in main: {str(e)}")
+    return rank_sections(model, persona, job, parsed, num_results)
+
+
+async def run_role_task_async(persona, job, pdf_paths, num_results=5, parse_pool=None):
+    """Run the role task without blocking the event loop.
+
+    PDFs are parsed on ``parse_pool`` (processes) unless cached; embedding
+    and ranking run on a small thread pool sharing the model, which is
+    loaded there by the first call. Each call
+    works on its own in-memory data, so concurrent calls are independent.
+    """
+    loop = asyncio.get_running_loop()
+    trace_id = metrics.current_trace_id()
+    paths = [str(path) for path in pdf_paths if os.path.exists(path)]
+
+    async def parse(path):
+        hit, sections = cached_sections(path)
+        if hit:
+            metrics.count("role_task_cache_hits")
+            return sections
+        if parse_pool is None:
+            sections = await loop.run_in_executor(get_rank_pool(), extract_pdf_sections, path)
+        else:
+            sections, observations = await loop.run_in_executor(
+                parse_pool, metrics.traced_call, trace_id, extract_pdf_sections, path)
+            metrics.merge_observations(observations)
+        cache_sections(path, sections)
+        return sections
+
+    results = await asyncio.gather(*(parse(path) for path in paths), return_exceptions=True)
+    parsed = []
+    for path, sections in zip(paths, results):
+        if isinstance(sections, Exception):
+            print(f"Error with {os.path.basename(path)} in role task: {sections}")
+            continue
+        parsed.append((os.path.basename(path), sections))
+    return await loop.run_in_executor(
+        get_rank_pool(), _rank_with_model, persona, job, parsed, num_results)
+
+
+def _rank_with_model(persona, job, parsed, num_results):
+    # On the rank pool: the first call loads the model off the event loop.
+    return rank_sections(get_model(), persona, job, parsed, num_results)
@@ -1,108 +1,119 @@
 import os
-import re
 import argparse
-import json
 import fitz
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from process_pdfs import main_process_pdf
-
-
-def combine_lines(s):
-    s = re.sub(r'^[\s][•\-–o]+\s', '', s, flags=re.MULTILINE)
-    lines = [line.strip() for line in s.splitlines() if line.strip()]
-    result, temp = [], ""
-    for line in lines:
-        if re.search(r'[.?!:,]$', line):
-            if temp:
-                temp += " " + line
-                result.append(temp.strip())
-                temp = ""
-            else:
-                result.append(line)
-        else:
-            if temp:
-                temp += ", " + line
-            else:
-                temp = line
-    if temp:
-        result.append(temp.strip())
-    return ' '.join(result)
+
+try:
+    from .process_pdfs import main_process_pdf
+    from .segmentation import section_headings, segment_sections
+    from .text_utils import INDENTED_BULLET_PREFIX_RE, combine_lines
+    from .index_store import store_for
+    from . import metrics
+except ImportError:  # run as a script from backend/
+    from process_pdfs import main_process_pdf
+    from segmentation import section_headings, segment_sections
+    from text_utils import INDENTED_BULLET_PREFIX_RE, combine_lines
+    from index_store import store_for
+    import metrics
 
 
 def extract_sections_from_pdf(pdf_path, headings_list):
-    heading_page_map = {h[0].strip(): h[1] for h in headings_list}
-    heading_texts = list(heading_page_map.keys())
     doc = fitz.open(pdf_path)
-    lines = "\n".join([page.get_text() for page in doc]).splitlines()
+    page_texts = [page.get_text() for page in doc]
     doc.close()
-    sections, current_section = [], None
-    for line in lines:
-        line_stripped = line.strip()
-        if line_stripped in heading_texts:
-            if current_section:
-                sections.append(current_section)
-            current_section = {
-                "title": line_stripped, "content": "", "page": heading_page_map[line_stripped]}
-        elif current_section:
-            current_section["content"] += line + "\n"
-    if current_section:
-        sections.append(current_section)
-    return sections
+    with metrics.timed("segment"):
+        return segment_sections(page_texts, headings_list)
 
 
 def load_index_and_metadata(index_path, meta_path, dim):
-    if os.path.exists(index_path) and os.path.exists(meta_path):
-        index = faiss.read_index(index_path)
-        with open(meta_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-    else:
-        index = faiss.IndexFlatIP(dim)
-        metadata = []
-    return index, metadata
+    """Open the segmented session index stored next to ``index_path``.
 
+    A legacy single-file index at ``index_path``/``meta_path`` is migrated
+    into the segment store on first access.
+    """
+    return store_for(index_path, meta_path).load(dim)
 
-def build_faiss_index(pdf_folder, session_id):
-    model = SentenceTransformer("intfloat/e5-base-v2")
-    dim = model.get_sentence_embedding_dimension()
+
+def session_index_paths(pdf_folder):
     parent_folder = os.path.abspath(os.path.join(pdf_folder, os.pardir))
     index_path = os.path.join(parent_folder, f"mysession_index.faiss")
     meta_path = os.path.join(parent_folder, f"mysession_metadata.json")
-    index, metadata = load_index_and_metadata(index_path, meta_path, dim)
+    return index_path, meta_path
+
+
+def extract_document_sections(pdf_path):
+    """Parse one PDF into index-ready section chunks (no embedding).
+
+    Safe to run in a worker process; returns [] when the PDF yields no
+    headings.
+    """
+    filename = os.path.basename(pdf_path)
+    extracted_headings = main_process_pdf(pdf_path)
+    if not extracted_headings:
+        return []
+    headings = section_headings(extracted_headings["outline"])
+    sections = extract_sections_from_pdf(pdf_path, headings)
     new_sections = []
-    for filename in os.listdir(pdf_folder):
-        if not filename.lower().endswith(".pdf"):
-            continue
-        if any(m["document"] == filename for m in metadata):
+    for sec in sections:
+        chunk_text = f"{sec['title']} - {combine_lines(sec['content'], INDENTED_BULLET_PREFIX_RE)}"
+        if len(chunk_text.strip()) < 30:
             continue
-        pdf_path = os.path.join(pdf_folder, filename)
-        extracted_headings = main_process_pdf(pdf_path)
-        if not extracted_headings:
-            continue
-        outline = extracted_headings["outline"]
-        headings = [[el["text"], el["page"]]
-                    for el in outline if el["level"] in ["H1", "H2"]]
-        sections = extract_sections_from_pdf(pdf_path, headings)
-        for sec in sections:
-            chunk_text = f"{sec['title']} - {combine_lines(sec['content'])}"
-            if len(chunk_text.strip()) < 30:
-                continue
-            new_sections.append(
-                {"document": filename, "title": sec["title"], "content": chunk_text, "page": sec["page"] + 1})
+        new_sections.append(
+            {"document": filename, "title": sec["title"], "content": chunk_text, "page": sec["page"] + 1})
+    return new_sections
+
+
+def append_sections(model, index_path, meta_path, new_sections):
+    """Embed ``new_sections`` and append them as a new index segment.
+
+    Safe to call from several threads or server workers at once: documents
+    another writer indexed in the meantime are dropped under the store lock.
+    """
+    store = store_for(index_path, meta_path)
+    indexed = store.documents()
+    new_sections = [sec for sec in new_sections if sec["document"] not in indexed]
     if not new_sections:
         print("⚠ No new sections extracted. Index not updated.")
-        return
-    embeddings = model.encode([sec["content"]
-                              for sec in new_sections], normalize_embeddings=True)
-    index.add(np.array(embeddings).astype('float32'))
-    metadata.extend(new_sections)
-    faiss.write_index(index, index_path)
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+        return 0
+    with metrics.timed("embed"):
+        embeddings = model.encode([sec["content"]
+                                  for sec in new_sections], normalize_embeddings=True)
+    metrics.count("embed", len(new_sections))
+    embeddings = np.array(embeddings).astype('float32')
+    with metrics.timed("index_write"), store.lock:
+        indexed = store.documents()
+        keep = [i for i, sec in enumerate(new_sections) if sec["document"] not in indexed]
+        if not keep:
+            print("⚠ Sections were indexed by another writer. Index not updated.")
+            return 0
+        new_sections = [new_sections[i] for i in keep]
+        store.append(embeddings[keep], new_sections)
     print(f"Appended {len(new_sections)} new sections to FAISS index.")
-    print(f"Index saved to: {index_path}")
-    print(f"Metadata saved to: {meta_path}")
+    print(f"Index segments saved to: {store.root}")
+    return len(new_sections)
+
+
+def indexed_documents(index_path, meta_path):
+    return store_for(index_path, meta_path).documents()
+
+
+def build_faiss_index(pdf_folder, session_id):
+    # Imported here so parse workers that only need extract_document_sections
+    # do not pay for loading torch.
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer("intfloat/e5-base-v2")
+    index_path, meta_path = session_index_paths(pdf_folder)
+    indexed = indexed_documents(index_path, meta_path)
+    new_sections = []
+    for filename in os.listdir(pdf_folder):
+        if not filename.lower().endswith(".pdf"):
+            continue
+        if filename in indexed:
+            continue
+        new_sections.extend(
+            extract_document_sections(os.path.join(pdf_folder, filename)))
+    append_sections(model, index_path, meta_path, new_sections)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+from bisect import bisect_right
+
+# Outline levels that start a section. Font-style detection ranks heading
+# sizes into H1-H3 (style_analysis.heading_levels), so H3 subsections get
+# their own sections instead of merging into their parent.
+SECTION_LEVELS = ("H1", "H2", "H3")
+
+
+def section_headings(outline):
+    """``[text, page]`` pairs of the outline entries that start a section."""
+    return [[h["text"], h["page"]] for h in outline if h["level"] in SECTION_LEVELS]
+
+
+def build_heading_index(headings):
+    """Map each heading text to the sorted pages it was detected on.
+
+    ``headings`` is an iterable of ``[text, page]`` pairs as produced from a
+    ``process_pdf`` outline. Repeated headings keep every page instead of
+    collapsing to the last one.
+    """
+    occurrences = {}
+    for text, page in headings:
+        occurrences.setdefault(text.strip(), set()).add(page)
+    return {text: (sorted(pages), pages) for text, pages in occurrences.items()}
+
+
+def resolve_heading_page(entry, current_page):
+    """Pick the occurrence of a heading that matches the page being scanned.
+
+    Falls back to the nearest earlier occurrence (or the first one) when the
+    heading text shows up on a page where it was not detected as a heading.
+    """
+    pages, page_set = entry
+    if current_page in page_set:
+        return current_page
+    pos = bisect_right(pages, current_page) - 1
+    return pages[pos] if pos >= 0 else pages[0]
+
+
+def segment_sections(page_texts, headings):
+    """Split document text into sections that start at detected headings.
+
+    Runs in a single pass over the lines of ``"\\n".join(page_texts)`` with a
+    hashed heading lookup per line, tracking which page each line starts on.
+    Returns a list of ``{"title", "content", "page"}`` dicts.
+    """
+    heading_index = build_heading_index(headings)
+    if not heading_index:
+        return []
+
+    page_starts = []
+    offset = 0
+    for text in page_texts:
+        page_starts.append(offset)
+        offset += len(text) + 1
+
+    full_text = "\n".join(page_texts)
+    lines = full_text.splitlines()
+    raw_lines = full_text.splitlines(keepends=True)
+
+    sections = []
+    title = None
+    page = None
+    body = []
+    current_page = 0
+    next_start = page_starts[1] if len(page_starts) > 1 else None
+    offset = 0
+
+    for line, raw in zip(lines, raw_lines):
+        while next_start is not None and offset >= next_start:
+            current_page += 1
+            next_start = page_starts[current_page + 1] if current_page + 1 < len(page_starts) else None
+        offset += len(raw)
+
+        line_stripped = line.strip()
+        entry = heading_index.get(line_stripped)
+        if entry is not None:
+            if title is not None:
+                sections.append({"title": title, "content": "".join(body), "page": page})
+            title = line_stripped
+            page = resolve_heading_page(entry, current_page)
+            body = []
+        elif title is not None:
+            body.append(line + "\n")
+
+    if title is not None:
+        sections.append({"title": title, "content": "".join(body), "page": page})
+
+    return sections
@@ -1,33 +1,56 @@
 import io
-from fastapi import FastAPI, UploadFile, File, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 from pathlib import Path
 import shutil
-import subprocess
 import uuid
-import datetime
-from backend.relevant_pages import get_relevant_pages
+from backend.relevant_pages import (
+    INDEX_PATH, MAPPING_PATH, get_relevant_pages_async, get_model as get_embedding_model)
+from backend.index_store import store_for
+from backend.session_store import SessionRegistry
+from backend.audio_cache import (
+    AUDIO_CACHE_DIR, EPISODE_CACHE_MAX_BYTES, TTS_CACHE_MAX_BYTES, DiskLRUCache, episode_key, tts_key)
+from backend.ingest import get_parse_pool, ingest_upload
+from backend.role_task import run_role_task_async
+from backend.admission import Admission, Overloaded, client_key
+from backend import metrics
+from backend.prompt_context import (
+    SELECTED_TEXT_TOKEN_BUDGET, build_history, compact_json, pack_chunks, truncate_to_tokens)
+import time
 import azure.cognitiveservices.speech as speechsdk
 import google.generativeai as genai
 import os
 import json
 import uvicorn
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse, JSONResponse
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
 PDF_FOLDER = Path("round1b") / "PDFs"
-INPUT_PATH = Path("round1b") / "input.json"
-OUTPUT_PATH = Path("round1b") / "output.json"
 
 PDF_FOLDER.mkdir(parents=True, exist_ok=True)
-SESSION_FOLDERS = {}
+# Shared across worker processes (SQLite), see backend/session_store.py.
+SESSION_FOLDERS = SessionRegistry()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker process, after the fork.
+    metrics.start_snapshots()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Loaded eagerly so the first upload/query does not pay for model start-up.
+# The role-task model is only loaded by the first /role-task call.
+embedding_model = get_embedding_model()
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel("gemini-1.5-flash")
@@ -37,6 +60,13 @@ AZURE_REGION = os.getenv("AZURE_REGION")
 
 PODCAST_CANCEL_FLAGS = {}
 
+# Per-endpoint concurrency limits and bounded queues, see backend/admission.py.
+ADMISSION = Admission()
+
+TTS_OUTPUT_FORMAT = "Audio16Khz32KBitRateMonoMp3"
+TTS_CACHE = DiskLRUCache(os.path.join(AUDIO_CACHE_DIR, "lines"), TTS_CACHE_MAX_BYTES)
+EPISODE_CACHE = DiskLRUCache(os.path.join(AUDIO_CACHE_DIR, "episodes"), EPISODE_CACHE_MAX_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -48,6 +78,39 @@ app.add_middleware(
 app.mount("/PDFs", StaticFiles(directory=PDF_FOLDER), name="files")
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace_id = request.headers.get("x-trace-id") or metrics.new_trace_id()
+    token = metrics.trace_id_var.set(trace_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        if metrics.ENABLED:
+            # Label by route template, not raw path, to keep cardinality bounded.
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            metrics.HTTP_REQUESTS.inc(path=path, status=status)
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - start, path=path)
+        metrics.trace_id_var.reset(token)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"error": str(exc)}, status_code=exc.status,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render_metrics(),
+                             media_type="text/plain; version=0.0.4")
+
+
 class TextSelectionRequest(BaseModel):
     session_id: str
     selected_text: str
@@ -76,66 +139,56 @@ def clear_session_folder(session_id: str):
         print(f"Cleared files for session: {session_id}")
 
 
-@app.post("/upload-past-docs")
-async def upload_past_docs(pdfs: List[UploadFile] = File(...)):
+def pdf_upload_schema(field, multiple):
+    # The body is streamed by backend/ingest.py instead of being declared as
+    # File(...) parameters, so describe the form for the OpenAPI docs here.
+    file_schema = {"type": "string", "format": "binary"}
+    if multiple:
+        file_schema = {"type": "array", "items": file_schema}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": {field: file_schema}, "required": [field]}}}}}
+
+
+@app.post("/upload-past-docs", openapi_extra=pdf_upload_schema("pdfs", multiple=True))
+async def upload_past_docs(request: Request):
+    # Queued uploads are not read yet, so clients are throttled by TCP.
+    async with await ADMISSION.ingest.acquire(client_key(request)):
+        return await _upload_past_docs(request)
+
+
+async def _upload_past_docs(request: Request):
     try:
+        # Each PDF is parsed as soon as its part is fully received, so
+        # indexing overlaps with the rest of the upload. The session only
+        # exists once the upload has been indexed.
+        documents = await ingest_upload(request, PDF_FOLDER, embedding_model)
         session_id, folder_path = create_session_folder()
-        documents = []
-        for pdf in pdfs:
-            file_path = folder_path / pdf.filename
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(pdf.file, buffer)
-            documents.append(pdf.filename)
-        print(f"Saved {len(documents)} PDFs to {folder_path}")
-        try:
-            subprocess.run(
-                [
-                    "python", "backend/save_pdfs.py",
-                    "--pdf_folder", str(folder_path),
-                    "--session_id", session_id
-                ],
-                check=True
-            )
-            print("save_pdfs.py executed successfully.")
-        except subprocess.CalledProcessError as e:
-            print(f"Error while running save_pdfs.py: {e}")
-            return {"error": "Failed to process uploaded documents."}
+        print(f"Saved and indexed {len(documents)} PDFs in {folder_path}")
         return {"session_id": session_id, "uploaded_files": documents}
     except Exception as e:
         return {"error": str(e)}
 
 
-@app.post("/upload-current-doc")
-async def upload_current_doc(pdf: UploadFile = File(...), session_id: str = Query(...)):
+@app.post("/upload-current-doc", openapi_extra=pdf_upload_schema("pdf", multiple=False))
+async def upload_current_doc(request: Request, session_id: str = Query(...)):
+    async with await ADMISSION.ingest.acquire(session_id):
+        return await _upload_current_doc(request, session_id)
+
+
+async def _upload_current_doc(request: Request, session_id: str):
     if session_id not in SESSION_FOLDERS:
         return {"error": "Invalid or missing session ID. Please upload past documents first."}
     try:
         folder_path = SESSION_FOLDERS[session_id]
-        file_path = folder_path / pdf.filename
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(pdf.file, buffer)
-
-        print(f"Current doc saved: {file_path}")
-
-        try:
-            subprocess.run(
-                [
-                    "python",
-                    "backend/save_pdfs.py",
-                    "--pdf_folder", str(folder_path),
-                    "--session_id", session_id
-                ],
-                check=True
-            )
-            print("save_pdfs.py executed successfully for current doc.")
-        except subprocess.CalledProcessError as e:
-            print(f"⚠ Error while running save_pdfs.py for current doc: {e}")
+        documents = await ingest_upload(request, folder_path, embedding_model, field="pdf")
+        if not documents:
             return {"error": "Failed to process current document."}
 
+        print(f"Current doc saved and indexed: {folder_path / documents[0]}")
+
         return {
             "message": "Current document uploaded and indexed successfully",
-            "filename": pdf.filename
+            "filename": documents[0]
         }
     except Exception as e:
         return {"error": str(e)}
@@ -143,6 +196,11 @@ async def upload_current_doc(pdf: UploadFile = File(...), session_id: str = Quer
 
 @app.post("/select-text")
 async def select_text(request: TextSelectionRequest):
+    async with await ADMISSION.interactive.acquire(request.session_id):
+        return await _select_text(request)
+
+
+async def _select_text(request: TextSelectionRequest):
     try:
         session_id = request.session_id
         selected_text = request.selected_text.strip()
@@ -152,7 +210,7 @@ async def select_text(request: TextSelectionRequest):
         if session_id not in SESSION_FOLDERS:
             return {"error": "Invalid or missing session ID. Please upload documents first."}
 
-        results = get_relevant_pages(selected_text, top_k=5)
+        results = await get_relevant_pages_async(selected_text, top_k=5)
 
         print("relevant text from select text....")
         if not results:
@@ -189,6 +247,11 @@ async def end_session(session_id: str):
 
 @app.post("/insights")
 async def get_insights(request: TextSelectionRequest):
+    async with await ADMISSION.interactive.acquire(request.session_id):
+        return await generate_insights(request)
+
+
+async def generate_insights(request: TextSelectionRequest):
     session_id = request.session_id
     selected_text = request.selected_text.strip()
 
@@ -196,7 +259,7 @@ async def get_insights(request: TextSelectionRequest):
         return {"error": "Invalid or missing session ID. Please upload documents first."}
 
     try:
-        results = get_relevant_pages(selected_text, top_k=10)
+        results = await get_relevant_pages_async(selected_text, top_k=10)
 
         if not results:
             return {
@@ -212,11 +275,11 @@ async def get_insights(request: TextSelectionRequest):
             }
 
         prompt = f"""
-        You are an analytical assistant. Based ONLY on the following context, generate insights about "{selected_text}".
+        You are an analytical assistant. Based ONLY on the following context, generate insights about "{truncate_to_tokens(selected_text, SELECTED_TEXT_TOKEN_BUDGET)}".
 
         Context:
         ---
-        {results}
+        {pack_chunks(results)}
         ---
 
         Generate a JSON object with the following keys:
@@ -228,12 +291,15 @@ async def get_insights(request: TextSelectionRequest):
         Do not use any information outside of the provided context.
         """
 
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                response_mime_type="application/json"
+        # The Gemini client blocks; keep the round-trip off the event loop.
+        with metrics.timed("llm"):
+            response = await asyncio.to_thread(
+                model.generate_content,
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    response_mime_type="application/json"
+                )
             )
-        )
 
         try:
             insights_json = json.loads(response.text)
@@ -251,21 +317,22 @@ def generate_podcast_script(selected_text: str, insights: dict) -> list:
     You are a podcast script generator.
     Based on the following text and insights, create a 2-3 minute conversation between Alice (female) and Bob (male).
     Selected Text:
-    "{selected_text}"
+    "{truncate_to_tokens(selected_text, SELECTED_TEXT_TOKEN_BUDGET)}"
     Insights:
-    {json.dumps(insights, indent=2)}
+    {compact_json(insights)}
     Rules:
     - ONLY output valid JSON
     - Format: [{{ "speaker": "Alice", "line": "..." }}, {{ "speaker": "Bob", "line": "..." }}]
     - No markdown, no commentary.
     - Alternate speakers naturally, 12–20 lines total.
     """
-    response = model.generate_content(
-        prompt,
-        generation_config=genai.types.GenerationConfig(
-            response_mime_type="application/json"
+    with metrics.timed("llm"):
+        response = model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                response_mime_type="application/json"
+            )
         )
-    )
     try:
         return json.loads(response.text)
     except json.JSONDecodeError:
@@ -278,14 +345,15 @@ def synthesize_voice(text: str, voice: str) -> bytes:
         region=AZURE_REGION
     )
     speech_config.set_speech_synthesis_output_format(
-        speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3
+        getattr(speechsdk.SpeechSynthesisOutputFormat, TTS_OUTPUT_FORMAT)
     )
     speech_config.speech_synthesis_voice_name = voice
 
     synthesizer = speechsdk.SpeechSynthesizer(
         speech_config=speech_config, audio_config=None
     )
-    result = synthesizer.speak_text_async(text).get()
+    with metrics.timed("tts"):
+        result = synthesizer.speak_text_async(text).get()
 
     if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
         return result.audio_data
@@ -293,6 +361,34 @@ def synthesize_voice(text: str, voice: str) -> bytes:
         raise Exception(f"TTS failed: {result.reason}")
 
 
+def synthesize_voice_cached(text: str, voice: str) -> bytes:
+    key = tts_key(voice, TTS_OUTPUT_FORMAT, text)
+    return TTS_CACHE.get_or_create(key, lambda: synthesize_voice(text, voice))
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes its body generator however the response
+    ends. Starlette leaves a generator suspended when the client goes away
+    mid-send, so cleanup in its finally would otherwise wait for GC."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+def podcast_episode_response(episode_id: str, path: str):
+    # FileResponse answers Range requests, so players can seek in replays.
+    return FileResponse(path, media_type="audio/mpeg",
+                        headers={"X-Podcast-Episode": episode_id})
+
+
+def session_index_version() -> str:
+    # Reads the manifest from disk; called through asyncio.to_thread.
+    return store_for(INDEX_PATH, MAPPING_PATH).version()
+
+
 @app.post("/podcast")
 async def podcast(request: TextSelectionRequest):
     session_id = request.session_id
@@ -302,22 +398,58 @@ async def podcast(request: TextSelectionRequest):
         raise HTTPException(status_code=400, detail="Invalid session ID.")
 
     try:
-        insights_data = await get_insights(request)
-        insights = insights_data["insights"]
-
-        dialogue = generate_podcast_script(selected_text, insights)
+        index_version = await asyncio.to_thread(session_index_version)
+        episode_id = episode_key(index_version, selected_text)
+        cached_path = EPISODE_CACHE.lookup(episode_id)
+        if cached_path:
+            return podcast_episode_response(episode_id, cached_path)
 
         async def audio_stream_generator():
-            for turn in dialogue:
-                speaker = turn["speaker"]
-                line = turn["line"]
-
-                voice = "en-US-JennyNeural" if speaker == "Alice" else "en-US-GuyNeural"
-
-                audio_chunk = synthesize_voice(line, voice)
-                yield audio_chunk
-        return StreamingResponse(audio_stream_generator(), media_type="audio/mpeg")
-
+            # Tee the stream into the episode cache; it is only published
+            # once every line has been synthesized.
+            episode_file, tmp_path = EPISODE_CACHE.open_temp()
+            completed = False
+            try:
+                yield b""
+                for turn in dialogue:
+                    speaker = turn["speaker"]
+                    line = turn["line"]
+
+                    voice = "en-US-JennyNeural" if speaker == "Alice" else "en-US-GuyNeural"
+
+                    audio_chunk = await asyncio.to_thread(synthesize_voice_cached, line, voice)
+                    episode_file.write(audio_chunk)
+                    yield audio_chunk
+                completed = True
+            finally:
+                episode_file.close()
+                ticket.release()
+                if completed:
+                    EPISODE_CACHE.commit(episode_id, tmp_path)
+                else:
+                    EPISODE_CACHE.discard(tmp_path)
+
+        # Held until the stream ends (or the client goes away).
+        ticket = await ADMISSION.podcast.acquire(session_id)
+        try:
+            insights_data = await generate_insights(request)
+            insights = insights_data["insights"]
+
+            dialogue = await asyncio.to_thread(generate_podcast_script, selected_text, insights)
+            stream = audio_stream_generator()
+            # Started before the response is returned, so that closing it
+            # always runs its finally, the only place the ticket is released
+            # from here on.
+            await stream.__anext__()
+        except BaseException:
+            ticket.release()
+            raise
+
+        return ClosingStreamingResponse(stream, media_type="audio/mpeg",
+                                        headers={"X-Podcast-Episode": episode_id})
+
+    except Overloaded:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=503, detail=f"Error generating script: {e}")
@@ -326,12 +458,27 @@ async def podcast(request: TextSelectionRequest):
             status_code=500, detail=f"An unexpected error occurred: {e}")
 
 
+@app.get("/podcast/episodes/{episode_id}")
+async def get_podcast_episode(episode_id: str):
+    if len(episode_id) != 64 or any(c not in "0123456789abcdef" for c in episode_id):
+        raise HTTPException(status_code=404, detail="Episode not found.")
+    path = EPISODE_CACHE.lookup(episode_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Episode not found.")
+    return podcast_episode_response(episode_id, path)
+
+
 @app.post("/role-task")
 async def generate_role_persona(
     session_id: Optional[str] = Query(None),
     persona_role: Optional[str] = Query("default_role"),
     task: Optional[str] = Query("default_task")
 ):
+    async with await ADMISSION.role_task.acquire(session_id):
+        return await _generate_role_persona(session_id, persona_role, task)
+
+
+async def _generate_role_persona(session_id, persona_role, task):
     try:
         if not session_id or session_id not in SESSION_FOLDERS:
             session_id, folder_path = create_session_folder()
@@ -342,37 +489,11 @@ async def generate_role_persona(
         if not pdf_files:
             return {"error": "No PDFs found in session folder.", "session_id": session_id}
 
-        documents = [{"filename": f.name, "title": f.stem} for f in pdf_files]
-
-        input_json = {
-            "documents": documents,
-            "persona": {"role": persona_role},
-            "job_to_be_done": {"task": task}
-        }
-        with open(INPUT_PATH, "w", encoding="utf-8") as f:
-            json.dump(input_json, f, indent=2)
-
-        skeleton_output = {
-            "metadata": {
-                "input_documents": [doc["filename"] for doc in documents],
-                "persona": persona_role,
-                "job_to_be_done": task,
-                "processing_timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()
-            },
-            "extracted_sections": [],
-            "subsection_analysis": []
-        }
-        with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-            json.dump(skeleton_output, f, indent=2)
-
-        subprocess.run(
-            ["python", "backend/main.py"], check=False)
-
-        if OUTPUT_PATH.exists():
-            with open(OUTPUT_PATH, "r", encoding="utf-8") as f:
-                return {"session_id": session_id, "data": json.load(f)}
-        else:
-            return {"error": "output.json not found", "session_id": session_id}
+        # In-process; concurrent calls share nothing but the model (loaded
+        # on first use) and the parsed-PDF cache (see backend/role_task.py).
+        data = await run_role_task_async(
+            persona_role, task, sorted(pdf_files), parse_pool=get_parse_pool())
+        return {"session_id": session_id, "data": data}
 
     except Exception as e:
         return {"error": str(e)}
@@ -386,6 +507,11 @@ async def stop_podcast(request: TextSelectionRequest):
 
 @app.post("/chatbot")
 async def pdf_chatbot(request: ChatRequest):
+    async with await ADMISSION.interactive.acquire(request.session_id):
+        return await _pdf_chatbot(request)
+
+
+async def _pdf_chatbot(request: ChatRequest):
     session_id = request.session_id
     selected_text = request.selected_text.strip()
     current_prompt = request.current_prompt.strip()
@@ -399,37 +525,38 @@ async def pdf_chatbot(request: ChatRequest):
 
     try:
         query_for_retrieval = f"{current_prompt}\nContext from document: {selected_text}"
-        relevant_chunks = get_relevant_pages(query_for_retrieval, top_k=5)
+        relevant_chunks = await get_relevant_pages_async(query_for_retrieval, top_k=5)
 
-        formatted_history = "\n".join(
-            [f"User: {turn['user']}\nAssistant: {turn['assistant']}" for turn in history])
+        # Static instructions and the condensed older history come first so
+        # consecutive turns share a long identical prompt prefix.
+        formatted_history = build_history(history)
 
         prompt = f"""
         You are a helpful assistant for answering questions based on provided documents.
+        Based on the chat history, the relevant information, AND the selected text provided, answer the user's current question.
+        If the information is not available in the provided context, state that you cannot find an answer in the documents.
+        Do not use any external knowledge.
 
         Chat History:
         {formatted_history}
 
         Relevant Information from Documents:
         ---
-        {json.dumps(relevant_chunks, indent=2)}
+        {pack_chunks(relevant_chunks)}
         ---
         
         Selected Text from Current Document:
         ---
-        {selected_text}
+        {truncate_to_tokens(selected_text, SELECTED_TEXT_TOKEN_BUDGET)}
         ---
 
         User's Current Question: {current_prompt}
 
-        Based on the chat history, the relevant information, AND the selected text provided, answer the user's current question.
-        If the information is not available in the provided context, state that you cannot find an answer in the documents.
-        Do not use any external knowledge.
-        
         Answer:
         """
 
-        response = model.generate_content(prompt)
+        with metrics.timed("llm"):
+            response = await asyncio.to_thread(model.generate_content, prompt)
 
         return {"response": response.text}
 
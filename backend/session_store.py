@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+
+class SessionRegistry:
+    """Session id -> PDF folder mapping shared by every server worker.
+
+    Backed by a local SQLite file (WAL mode) so that a session created by one
+    uvicorn/gunicorn worker is visible to the others. Supports the subset of
+    the dict interface the server used with its old in-process dict.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, folder TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def get(self, session_id, default=None):
+        if not session_id:
+            return default
+        row = self._connect().execute(
+            "SELECT folder FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return Path(row[0]) if row else default
+
+    def __getitem__(self, session_id):
+        folder = self.get(session_id)
+        if folder is None:
+            raise KeyError(session_id)
+        return folder
+
+    def __setitem__(self, session_id, folder):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, folder, created_at) VALUES (?, ?, ?)",
+            (session_id, str(folder), time.time()))
+
+    def __delitem__(self, session_id):
+        if self.pop(session_id, None) is None:
+            raise KeyError(session_id)
+
+    def pop(self, session_id, default=None):
+        folder = self.get(session_id)
+        if folder is None:
+            return default
+        self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return folder
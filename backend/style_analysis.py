@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+
+try:
+    from .text_utils import clean_texts
+except ImportError:  # run as a script from backend/
+    from text_utils import clean_texts
+
+# Heading detection from font statistics, see heading_levels().
+HEADING_SIZE_RATIO = float(os.getenv("HEADING_SIZE_RATIO", "1.15"))
+HEADING_MAX_CHAR_SHARE = float(os.getenv("HEADING_MAX_CHAR_SHARE", "0.15"))
+MAX_HEADING_WORDS = 15
+MAX_HEADING_LEVELS = 3
+# Pages with less text than this are judged against the document's body style.
+MIN_PAGE_BODY_CHARS = 200
+SIZE_BUCKET = 0.5  # points
+BOLD_FLAG = 1 << 4  # PyMuPDF span flag
+
+
+class PageLines:
+    """Text lines of one page with their spans merged: cleaned text plus the
+    dominant font family, size, boldness and character count of each line."""
+
+    __slots__ = ("texts", "fonts", "sizes", "bold", "chars")
+
+    def __init__(self, texts, fonts, sizes, bold, chars):
+        self.texts = texts
+        self.fonts = fonts
+        self.sizes = np.asarray(sizes, dtype="float32")
+        self.bold = np.asarray(bold, dtype=bool)
+        self.chars = np.asarray(chars, dtype="int32")
+
+
+def _font_family(span):
+    # "ABCDEF+Arial-BoldMT" -> "Arial": drop the subset tag and style suffix.
+    name = span.get("font", "").split("+", 1)[-1]
+    return name.split("-", 1)[0].split(",", 1)[0]
+
+
+def _is_bold(span):
+    return bool(span.get("flags", 0) & BOLD_FLAG) or "bold" in span.get("font", "").lower()
+
+
+def page_lines(page, text_flags):
+    """Collect a page's lines from ``page.get_text("dict")``.
+
+    The spans of a line become one record; its size and weight are those of
+    the span holding most of the line's characters.
+    """
+    blocks = page.get_text("dict", flags=text_flags)["blocks"]
+    raw, fonts, sizes, bold, chars = [], [], [], [], []
+    for block in blocks:
+        for line in block.get("lines", []):
+            spans = line.get("spans", [])
+            counts = [len(span.get("text", "").strip()) for span in spans]
+            total = sum(counts)
+            if not total:
+                continue
+            dominant = max(range(len(spans)), key=counts.__getitem__)
+            bold_chars = sum(n for span, n in zip(spans, counts) if _is_bold(span))
+            raw.append("".join(span.get("text", "") for span in spans))
+            fonts.append(_font_family(spans[dominant]))
+            sizes.append(spans[dominant].get("size", 0))
+            bold.append(bold_chars * 2 > total)
+            chars.append(total)
+    return PageLines(clean_texts(raw), fonts, sizes, bold, chars)
+
+
+def heading_levels(pages):
+    """Heading level of every line (0 for body text) of a document's pages.
+
+    ``pages`` is the list of PageLines of one document; the result is one
+    array per page. Everything is computed in a single vectorized pass over
+    a character-weighted (font family, size, bold) histogram:
+
+    * the body style of a page is its most used style (pages with little
+      text fall back to the document's), so documents that change body font
+      between pages are handled;
+    * a line is a heading when its style is at least HEADING_SIZE_RATIO
+      times the body size, or bold at body size over a regular body, and the
+      style is rare in the document (HEADING_MAX_CHAR_SHARE);
+    * heading styles are ranked document-wide by size, then weight (the
+      family does not count): the largest is H1, the next H2, the rest H3.
+    """
+    counts = [len(lines.texts) for lines in pages]
+    if not sum(counts):
+        return [np.zeros(n, dtype="int64") for n in counts]
+    sizes = np.concatenate([lines.sizes for lines in pages])
+    bold = np.concatenate([lines.bold for lines in pages])
+    chars = np.concatenate([lines.chars for lines in pages])
+    page_ids = np.repeat(np.arange(len(pages)), counts)
+
+    # Rank = size bucket * 2 + bold, so descending ranks put larger (then
+    # bold) styles first; a style is a (family, rank) pair.
+    line_ranks = np.round(sizes / SIZE_BUCKET).astype("int64") * 2 + bold
+    families, family_ids = np.unique(
+        np.array([font for lines in pages for font in lines.fonts], dtype=object), return_inverse=True)
+    keys, first, styles = np.unique(line_ranks * len(families) + family_ids,
+                                    return_index=True, return_inverse=True)
+    n_styles = len(keys)
+    ranks = line_ranks[first]
+    key_sizes = (ranks // 2) * SIZE_BUCKET
+    key_bold = (ranks % 2).astype(bool)
+
+    doc_weights = np.bincount(styles, weights=chars, minlength=n_styles)
+    share = doc_weights / doc_weights.sum()
+    page_weights = np.bincount(page_ids * n_styles + styles, weights=chars,
+                               minlength=len(pages) * n_styles).reshape(len(pages), n_styles)
+    page_body = np.where(page_weights.sum(axis=1) >= MIN_PAGE_BODY_CHARS,
+                         page_weights.argmax(axis=1), doc_weights.argmax())
+    body = page_body[page_ids]
+
+    body_size = key_sizes[body]
+    line_size = key_sizes[styles]
+    larger = line_size >= body_size * HEADING_SIZE_RATIO
+    emphasized = (line_size >= body_size) & key_bold[styles] & ~key_bold[body]
+    is_heading = (larger | emphasized) & (share[styles] <= HEADING_MAX_CHAR_SHARE)
+
+    heading_ranks = np.unique(line_ranks[is_heading])[::-1]
+    if not len(heading_ranks):
+        return np.split(np.zeros(len(styles), dtype="int64"), np.cumsum(counts)[:-1])
+    rank_level = np.minimum(np.arange(1, len(heading_ranks) + 1), MAX_HEADING_LEVELS)
+    # Position of each line's rank in the descending heading ranks.
+    position = np.searchsorted(-heading_ranks, -line_ranks)
+    levels = np.where(is_heading, rank_level[np.minimum(position, len(rank_level) - 1)], 0)
+    return np.split(levels, np.cumsum(counts)[:-1])
+
+
+def page_headings(page_num, lines, levels):
+    """Outline entries for the heading lines of one page."""
+    headings = []
+    for i in np.flatnonzero(levels):
+        text = lines.texts[i]
+        if text and len(text.split()) < MAX_HEADING_WORDS:
+            headings.append({"level": f"H{levels[i]}", "text": text, "page": page_num})
+    return headings
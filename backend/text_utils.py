@@ -0,0 +1,70 @@
+import re
+
+# Patterns are compiled once at import time; these helpers run on every line
+# of every document during ingestion.
+BULLET_PREFIX_RE = re.compile(r'^[\s]*[•\-–o]+\s*', flags=re.MULTILINE)
+# Variant used by save_pdfs: a bullet is only stripped when it is preceded by
+# exactly one whitespace character.
+INDENTED_BULLET_PREFIX_RE = re.compile(r'^[\s][•\-–o]+\s', flags=re.MULTILINE)
+MARKDOWN_HEADING_RE = re.compile(r'^(#+)\s+(.*)')
+BOLD_LINE_RE = re.compile(r"\*\*(.+?)\*\*")
+
+LINE_TERMINATORS = frozenset(".?!:,")
+
+# Drops markdown emphasis markers and folds typographic dashes/quotes in a
+# single str.translate pass.
+_MARKDOWN_TABLE = str.maketrans({
+    '*': None, '_': None, '`': None,
+    '–': '-', '“': '"', '”': '"',
+})
+
+
+def clean_text(text):
+    """Normalize a markdown/PDF span: strip emphasis markers, fold dashes and
+    quotes, collapse whitespace."""
+    if not text:
+        return ""
+    return " ".join(str(text).translate(_MARKDOWN_TABLE).split())
+
+
+def clean_texts(texts):
+    """Bulk variant of :func:`clean_text` for all spans/lines of a page."""
+    translate = str.translate
+    table = _MARKDOWN_TABLE
+    return [" ".join(translate(str(t), table).split()) if t else "" for t in texts]
+
+
+def join_lines(lines):
+    """Join stripped, non-empty lines into sentences in a single pass.
+
+    Lines without terminal punctuation are buffered and joined with ", " until
+    a line ending in one of ``.?!:,`` closes the sentence.
+    """
+    result = []
+    pending = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[-1] in LINE_TERMINATORS:
+            if pending:
+                result.append(", ".join(pending) + " " + line)
+                pending = []
+            else:
+                result.append(line)
+        else:
+            pending.append(line)
+    if pending:
+        result.append(", ".join(pending))
+    return ' '.join(result)
+
+
+def combine_lines(s, bullet_re=BULLET_PREFIX_RE):
+    """Strip leading bullets and merge wrapped lines of a section body."""
+    return join_lines(bullet_re.sub('', s).splitlines())
+
+
+def combine_lines_bulk(texts, bullet_re=BULLET_PREFIX_RE):
+    """Apply :func:`combine_lines` to many section bodies at once."""
+    sub = bullet_re.sub
+    return [join_lines(sub('', s).splitlines()) for s in texts]
@@ -0,0 +1,50 @@
+"""Text normalization as it was before backend/text_utils.py.
+
+Kept verbatim as the reference implementation: the ``text_normalization``
+scenario times it next to the shared helpers, and tests/test_text_utils.py
+checks that both produce the same output.
+"""
+import re
+
+
+def clean_text(text):
+    # backend/process_pdfs.py
+    if not text:
+        return ""
+    text = str(text)
+    text = re.sub(r'[\*_`]', '', text)
+    text = text.replace('–', '-').replace('“', '"').replace('”', '"')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def _combine_lines(s, bullet_pattern):
+    s = re.sub(bullet_pattern, '', s, flags=re.MULTILINE)
+    lines = [line.strip() for line in s.splitlines() if line.strip()]
+    result, temp = [], ""
+    for line in lines:
+        if re.search(r'[.?!:,]$', line):
+            if temp:
+                temp += " " + line
+                result.append(temp.strip())
+                temp = ""
+            else:
+                result.append(line)
+        else:
+            if temp:
+                temp += ", " + line
+            else:
+                temp = line
+    if temp:
+        result.append(temp.strip())
+    return ' '.join(result)
+
+
+def combine_lines(s):
+    # backend/main.py
+    return _combine_lines(s, r'^[\s]*[•\-–o]+\s*')
+
+
+def combine_lines_indented(s):
+    # backend/save_pdfs.py
+    return _combine_lines(s, r'^[\s][•\-–o]+\s')
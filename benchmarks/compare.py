@@ -0,0 +1,63 @@
+"""Compare two benchmark result files produced by benchmarks.run.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 if any latency (``*_s``) grew, or any throughput
+(``*_per_s``) shrank, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def direction(metric):
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s"):
+        return -1
+    return 0
+
+
+def compare(baseline, candidate, threshold):
+    rows, regressions = [], []
+    for name, base_metrics in baseline["scenarios"].items():
+        cand_metrics = candidate["scenarios"].get(name)
+        if not cand_metrics:
+            continue
+        for metric, base in base_metrics.items():
+            cand = cand_metrics.get(metric)
+            sign = direction(metric)
+            if not sign or not isinstance(base, (int, float)) or not isinstance(cand, (int, float)) or not base:
+                continue
+            change = (cand - base) / base
+            regressed = change * sign < -threshold
+            rows.append((name, metric, base, cand, change, regressed))
+            if regressed:
+                regressions.append((name, metric))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change treated as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, metric, base, cand, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:22} {metric:40} {base:12.4g} -> {cand:12.4g} ({change:+.1%}){flag}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
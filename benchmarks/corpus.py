@@ -0,0 +1,103 @@
+"""Deterministic synthetic PDF corpora for benchmarks.
+
+Every document is derived from ``(seed, doc_index)`` only, so two runs with
+the same arguments produce byte-for-byte comparable workloads.
+"""
+import argparse
+import os
+import random
+
+import fitz
+
+WORDS = (
+    "analysis budget climate design energy finance growth health index journey "
+    "knowledge liability market network operation policy quality revenue safety "
+    "travel update volume workflow yield zone contract guideline partner review "
+    "schedule migration storage latency service customer region itinerary hotel "
+    "recipe menu training benefit risk compliance audit forecast strategy"
+).split()
+
+# (fontname, body size, heading size) combinations; "font mix" picks several.
+FONT_STYLES = [
+    ("helv", 10, 16),
+    ("tiro", 11, 18),
+    ("cour", 9, 14),
+    ("hebo", 12, 20),
+    ("helv", 14, 24),  # large print: body text above the old 12pt heading cutoff
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+
+
+def _sentence(rng, min_words=6, max_words=18):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def _heading(rng, number):
+    return f"{number} " + " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 5)))
+
+
+def generate_pdf(path, pages=10, headings_per_page=2.0, font_mix=1, seed=0, doc_index=0):
+    """Write one synthetic PDF and return a summary of what it contains.
+
+    ``headings_per_page`` is the mean number of headings on a page (each of
+    eight text slots becomes a heading with probability headings_per_page / 8) and ``font_mix`` is how many of FONT_STYLES are
+    used across the document.
+    """
+    rng = random.Random(f"{seed}:{doc_index}")
+    styles = FONT_STYLES[:max(1, min(font_mix, len(FONT_STYLES)))]
+    doc = fitz.open()
+    doc.set_metadata({"title": f"Synthetic document {doc_index}", "producer": "benchmarks.corpus",
+                      "creationDate": "D:20240101000000", "modDate": "D:20240101000000"})
+    heading_count = 0
+    for page_no in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        font, body_size, heading_size = rng.choice(styles)
+        n_headings = sum(1 for _ in range(8) if rng.random() < headings_per_page / 8)
+        heading_slots = set(rng.sample(range(8), n_headings))
+        y = MARGIN
+        for slot in range(8):
+            if slot in heading_slots:
+                heading_count += 1
+                y += heading_size
+                page.insert_text((MARGIN, y), _heading(rng, heading_count),
+                                 fontname=font, fontsize=heading_size)
+                y += heading_size * 0.6
+            lines = rng.randint(2, 5)
+            for _ in range(lines):
+                y += body_size * 1.4
+                if y > PAGE_HEIGHT - MARGIN:
+                    break
+                page.insert_text((MARGIN, y), _sentence(rng)[:95],
+                                 fontname=font, fontsize=body_size)
+            if y > PAGE_HEIGHT - MARGIN:
+                break
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return {"path": path, "pages": pages, "headings": heading_count}
+
+
+def generate_corpus(folder, documents=3, pages=10, headings_per_page=2.0, font_mix=1, seed=0):
+    os.makedirs(folder, exist_ok=True)
+    summaries = []
+    for doc_index in range(documents):
+        path = os.path.join(folder, f"synthetic_{seed}_{doc_index:03d}.pdf")
+        summaries.append(generate_pdf(path, pages=pages, headings_per_page=headings_per_page,
+                                      font_mix=font_mix, seed=seed, doc_index=doc_index))
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF corpus.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--headings_per_page", type=float, default=2.0)
+    parser.add_argument("--font_mix", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for summary in generate_corpus(args.out, args.documents, args.pages,
+                                   args.headings_per_page, args.font_mix, args.seed):
+        print(summary)
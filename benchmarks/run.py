@@ -0,0 +1,692 @@
+"""End-to-end benchmark runner.
+
+Runs fully offline: PDFs come from benchmarks.corpus, Gemini and Azure TTS are
+replaced by the local stub servers in benchmarks.stubs, and the embedding
+model defaults to the deterministic HashEmbedder (``--embedder real`` uses the
+configured SentenceTransformer if it is available locally).
+
+Results are written as JSON; compare two runs with ``benchmarks.compare``.
+Metric names ending in ``_per_s`` are throughputs (higher is better), names
+ending in ``_s`` are latencies/durations (lower is better).
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --scenarios ingest,query_latency --pages 50
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_ROOT, "backend")
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.corpus import generate_corpus  # noqa: E402
+from benchmarks import stubs  # noqa: E402
+
+SCENARIOS = {}
+
+QUERIES = [
+    "budget forecast for the next quarter",
+    "safety compliance audit guideline",
+    "hotel itinerary for travel partners",
+    "customer revenue growth strategy",
+    "storage latency and service migration",
+    "training benefit and risk review",
+]
+
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+
+    return {
+        "count": len(samples),
+        "mean_s": statistics.fmean(samples),
+        "p50_s": pct(50),
+        "p95_s": pct(95),
+        "p99_s": pct(99),
+        "max_s": samples[-1],
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _multipart(field, paths):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        parts.append(
+            (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+             f"filename=\"{os.path.basename(path)}\"\r\nContent-Type: application/pdf\r\n\r\n").encode()
+            + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Context:
+    """Shared state for one benchmark run: work dir, corpus and (lazily) an
+    in-process API server wired to the stubs."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="adobe-bench-")
+        self.corpus_dir = os.path.join(self.workdir, "corpus")
+        self.corpus = generate_corpus(
+            self.corpus_dir, documents=args.documents, pages=args.pages,
+            headings_per_page=args.headings_per_page, font_mix=args.font_mix, seed=args.seed)
+        self.base_url = None
+        self.session_id = None
+        self.gemini = None
+        self.tts = None
+        self._uvicorn = None
+
+    @property
+    def corpus_paths(self):
+        return [doc["path"] for doc in self.corpus]
+
+    def start_server(self):
+        if self.base_url:
+            return
+        # The server resolves round1b/ and backend/main.py relative to cwd.
+        os.symlink(BACKEND_DIR, os.path.join(self.workdir, "backend"))
+        os.chdir(self.workdir)
+
+        from backend import relevant_pages, role_task
+        if self.args.embedder == "stub":
+            relevant_pages.set_model(stubs.HashEmbedder(delay_per_batch=self.args.embed_latency))
+            role_task.set_model(stubs.HashEmbedder(dim=384, delay_per_batch=self.args.embed_latency))
+
+        import uvicorn
+        from backend import server
+
+        self.start_stubs()
+        server.model = stubs.StubGeminiModel(self.gemini.url)
+        server.synthesize_voice = stubs.stub_synthesizer(self.tts.url)
+
+        port = _free_port()
+        config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+        self._uvicorn = uvicorn.Server(config)
+        threading.Thread(target=self._uvicorn.run, daemon=True).start()
+        while not self._uvicorn.started:
+            time.sleep(0.05)
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def start_stubs(self):
+        if self.gemini:
+            return
+        self.gemini = stubs.StubGeminiServer(
+            base_latency=self.args.llm_latency, per_1k_prompt_tokens=self.args.llm_per_1k_tokens).start()
+        self.tts = stubs.StubTTSServer(base_latency=self.args.tts_latency).start()
+
+    def request(self, method, path, payload=None, body=None, content_type=None, raw=False,
+                base_url=None):
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            content_type = "application/json"
+        req = urllib.request.Request((base_url or self.base_url) + path, data=body, method=method)
+        if content_type:
+            req.add_header("Content-Type", content_type)
+        with urllib.request.urlopen(req, timeout=600) as response:
+            data = response.read()
+        return data if raw else json.loads(data)
+
+    def new_session(self):
+        """Upload the corpus as a new session and return its id."""
+        self.start_server()
+        body, content_type = _multipart("pdfs", self.corpus_paths)
+        result = self.request("POST", "/upload-past-docs", body=body, content_type=content_type)
+        if "session_id" not in result:
+            raise RuntimeError(f"upload failed: {result}")
+        return result["session_id"]
+
+    def ensure_session(self):
+        if self.session_id is None:
+            self.session_id = self.new_session()
+        return self.session_id
+
+    def close(self):
+        if self._uvicorn:
+            self._uvicorn.should_exit = True
+        for stub in (self.gemini, self.tts):
+            if stub:
+                stub.stop()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _page_texts(path):
+    import fitz
+    with fitz.open(path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def _per_call_s(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+@scenario("text_normalization")
+def bench_text_normalization(ctx):
+    """Shared text helpers against the per-module implementations they
+    replaced (benchmarks/baseline_text.py), on the corpus text."""
+    from backend.text_utils import clean_texts, combine_lines_bulk
+    from benchmarks import baseline_text
+    pages = [text for path in ctx.corpus_paths for text in _page_texts(path)]
+    lines = [line for text in pages for line in text.splitlines()]
+    repeat = ctx.args.repeat
+    clean_s = _per_call_s(lambda: clean_texts(lines), repeat)
+    baseline_clean_s = _per_call_s(lambda: [baseline_text.clean_text(line) for line in lines], repeat)
+    combine_s = _per_call_s(lambda: combine_lines_bulk(pages), repeat)
+    baseline_combine_s = _per_call_s(lambda: [baseline_text.combine_lines(text) for text in pages], repeat)
+    return {
+        "lines": len(lines),
+        "clean_texts_s": clean_s,
+        "clean_texts_lines_per_s": len(lines) / clean_s,
+        "baseline_clean_text_s": baseline_clean_s,
+        "clean_texts_speedup": baseline_clean_s / clean_s,
+        "combine_lines_s": combine_s,
+        "combine_lines_pages_per_s": len(pages) / combine_s,
+        "baseline_combine_lines_s": baseline_combine_s,
+        "combine_lines_speedup": baseline_combine_s / combine_s,
+    }
+
+
+@scenario("segmentation")
+def bench_segmentation(ctx):
+    from backend.process_pdfs import process_pdf
+    from backend.segmentation import section_headings, segment_sections
+    total_s, sections, lines, outline_headings = 0.0, 0, 0, 0
+    for path in ctx.corpus_paths:
+        outline = process_pdf(path, workers=1)["outline"]
+        outline_headings += len(outline)
+        headings = section_headings(outline)
+        pages = _page_texts(path)
+        lines += sum(len(text.splitlines()) for text in pages)
+        start = time.perf_counter()
+        for _ in range(ctx.args.repeat):
+            result = segment_sections(pages, headings)
+        total_s += (time.perf_counter() - start) / ctx.args.repeat
+        sections += len(result)
+    return {"sections": sections, "outline_headings": outline_headings,
+            "true_headings": sum(doc["headings"] for doc in ctx.corpus),
+            "segment_s": total_s, "segment_lines_per_s": lines / total_s}
+
+
+@scenario("parse_scaling")
+def bench_parse_scaling(ctx):
+    from backend.process_pdfs import process_pdf
+    path = ctx.corpus_paths[0]
+    pages = ctx.corpus[0]["pages"]
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    result = {"pages": pages, "cpu_count": cpus}
+    baseline = None
+    for workers in worker_counts:
+        # Shard pools are long-lived; keep their start-up out of the timing.
+        process_pdf(path, workers=workers)
+        start = time.perf_counter()
+        process_pdf(path, workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        result[f"workers_{workers}_s"] = elapsed
+        result[f"workers_{workers}_pages_per_s"] = pages / elapsed
+        result[f"workers_{workers}_speedup"] = baseline / elapsed
+    return result
+
+
+@scenario("ingest")
+def bench_ingest(ctx):
+    ctx.start_server()
+    body, content_type = _multipart("pdfs", ctx.corpus_paths)
+    start = time.perf_counter()
+    result = ctx.request("POST", "/upload-past-docs", body=body, content_type=content_type)
+    elapsed = time.perf_counter() - start
+    if "session_id" not in result:
+        raise RuntimeError(f"upload failed: {result}")
+    ctx.session_id = result["session_id"]
+    pages = sum(doc["pages"] for doc in ctx.corpus)
+    return {
+        "documents": len(ctx.corpus),
+        "pages": pages,
+        "bytes": len(body),
+        "upload_and_index_s": elapsed,
+        "ingest_pages_per_s": pages / elapsed,
+        "ingest_mb_per_s": len(body) / elapsed / 1e6,
+    }
+
+
+@scenario("query_latency")
+def bench_query_latency(ctx):
+    session_id = ctx.ensure_session()
+    start = time.perf_counter()
+    ctx.request("POST", "/select-text", {"session_id": session_id, "selected_text": QUERIES[0]})
+    cold = time.perf_counter() - start
+    samples = []
+    for i in range(ctx.args.iterations):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        ctx.request("POST", "/select-text", {"session_id": session_id, "selected_text": query})
+        samples.append(time.perf_counter() - start)
+    warm = summarize(samples)
+    return {"cold_s": cold, **{f"warm_{k}": v for k, v in warm.items()},
+            "warm_queries_per_s": len(samples) / sum(samples)}
+
+
+@scenario("concurrent_sessions")
+def bench_concurrent_sessions(ctx):
+    """Mixed /select-text and /insights load from ``--concurrency`` clients,
+    each driving its own session."""
+    clients = ctx.args.concurrency
+    per_client = max(1, ctx.args.iterations // clients)
+    sessions = [ctx.ensure_session()] + [ctx.new_session() for _ in range(clients - 1)]
+
+    def client(n):
+        session_id = sessions[n]
+        latencies = []
+        for i in range(per_client):
+            endpoint = "/insights" if (n + i) % 4 == 0 else "/select-text"
+            query = QUERIES[(n + i) % len(QUERIES)]
+            start = time.perf_counter()
+            ctx.request("POST", endpoint, {"session_id": session_id, "selected_text": query})
+            latencies.append((endpoint, time.perf_counter() - start))
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = [lat for chunk in pool.map(client, range(clients)) for lat in chunk]
+    wall = time.perf_counter() - start
+    out = {"clients": clients, "sessions": len(set(sessions)), "requests": len(results),
+           "requests_per_s": len(results) / wall}
+    for endpoint in ("/select-text", "/insights"):
+        stats = summarize([s for e, s in results if e == endpoint])
+        out.update({f"{endpoint.strip('/').replace('-', '_')}_{k}": v for k, v in stats.items()})
+    return out
+
+
+@scenario("queries_during_ingest")
+def bench_queries_during_ingest(ctx):
+    """/select-text latency while a burst of uploads is being indexed, and
+    how many of those uploads were turned away with 429."""
+    session_id = ctx.ensure_session()
+    body, content_type = _multipart("pdfs", ctx.corpus_paths)
+    statuses = []
+
+    def upload(_):
+        try:
+            ctx.request("POST", "/upload-past-docs", body=body, content_type=content_type)
+            statuses.append(200)
+        except urllib.error.HTTPError as e:
+            statuses.append(e.code)
+
+    def queries():
+        samples = []
+        for i in range(ctx.args.iterations):
+            start = time.perf_counter()
+            ctx.request("POST", "/select-text", {"session_id": session_id,
+                                                 "selected_text": QUERIES[i % len(QUERIES)]})
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    idle = summarize(queries())
+    with ThreadPoolExecutor(max_workers=ctx.args.concurrency + 1) as pool:
+        uploads = [pool.submit(upload, n) for n in range(ctx.args.concurrency * 2)]
+        loaded = summarize(queries())
+        for future in uploads:
+            future.result()
+    return {
+        "uploads": len(statuses),
+        "uploads_rejected": sum(1 for status in statuses if status == 429),
+        **{f"idle_select_{k}": v for k, v in idle.items()},
+        **{f"loaded_select_{k}": v for k, v in loaded.items()},
+    }
+
+
+def _child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # Fields after the parenthesized command name: state, ppid, ...
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return children
+
+
+def _worker_pids(pid):
+    # uvicorn serves a single worker in the master process itself.
+    return _child_pids(pid) or [pid]
+
+
+def _memory_bytes(pid):
+    """``(rss, pss)`` of a process. PSS splits shared pages between the
+    processes mapping them, so it shows what copy-on-write sharing saves."""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+def _multi_worker_command(workers, port):
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        # No preloading here, so every worker holds its own copy of the app.
+        return "uvicorn", [sys.executable, "-m", "uvicorn", "benchmarks.worker_app:app",
+                           "--host", "127.0.0.1", "--port", str(port),
+                           "--workers", str(workers), "--log-level", "warning"]
+    return "gunicorn", [sys.executable, "-m", "gunicorn", "-c",
+                        os.path.join(BACKEND_DIR, "gunicorn_conf.py"), "benchmarks.worker_app:app"]
+
+
+@scenario("multi_worker")
+def bench_multi_worker(ctx):
+    """/select-text throughput and worker memory for each ``--workers`` count.
+
+    Every count gets a fresh server process tree and a fresh session. Memory
+    is summed over the worker processes after the load, so it includes what
+    each worker allocated while serving.
+    """
+    if not os.path.isdir("/proc"):
+        raise RuntimeError("multi_worker needs /proc to measure worker memory")
+    ctx.start_stubs()
+    body, content_type = _multipart("pdfs", ctx.corpus_paths)
+    result = {"cpu_count": os.cpu_count()}
+    baseline = None
+    for workers in [int(n) for n in ctx.args.workers.split(",")]:
+        run_dir = os.path.join(ctx.workdir, f"workers-{workers}")
+        os.makedirs(run_dir)
+        port = _free_port()
+        server_name, command = _multi_worker_command(workers, port)
+        env = {**os.environ,
+               "PYTHONPATH": REPO_ROOT, "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}",
+               "BENCH_EMBEDDER": ctx.args.embedder, "BENCH_EMBED_LATENCY": str(ctx.args.embed_latency),
+               "BENCH_GEMINI_URL": ctx.gemini.url, "BENCH_TTS_URL": ctx.tts.url}
+        # Own process group, so parse pools of the workers are stopped with it.
+        process = subprocess.Popen(command, cwd=run_dir, env=env, start_new_session=True)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 300
+            while len(_worker_pids(process.pid)) < workers or not _server_ready(base_url):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"{server_name} with {workers} workers did not start")
+                time.sleep(0.2)
+            session = ctx.request("POST", "/upload-past-docs", body=body, content_type=content_type,
+                                  base_url=base_url)
+            if "session_id" not in session:
+                raise RuntimeError(f"upload failed: {session}")
+            payload = {"session_id": session["session_id"], "selected_text": QUERIES[0]}
+            # Warm every worker's index cache before timing.
+            for _ in range(workers * 4):
+                ctx.request("POST", "/select-text", payload, base_url=base_url)
+
+            def client(n):
+                for i in range(ctx.args.iterations):
+                    ctx.request("POST", "/select-text",
+                                {**payload, "selected_text": QUERIES[(n + i) % len(QUERIES)]},
+                                base_url=base_url)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=ctx.args.concurrency) as pool:
+                list(pool.map(client, range(ctx.args.concurrency)))
+            requests_per_s = ctx.args.concurrency * ctx.args.iterations / (time.perf_counter() - start)
+            memory = [_memory_bytes(pid) for pid in _worker_pids(process.pid)]
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        baseline = baseline or requests_per_s
+        rss = sum(r for r, _ in memory)
+        pss = sum(p for _, p in memory)
+        result.update({
+            "server": server_name,
+            f"workers_{workers}_requests_per_s": requests_per_s,
+            f"workers_{workers}_speedup": requests_per_s / baseline,
+            f"workers_{workers}_rss_bytes": rss,
+            f"workers_{workers}_pss_bytes": pss,
+            f"workers_{workers}_pss_per_worker_bytes": pss / max(1, len(memory)),
+        })
+    return result
+
+
+def _server_ready(base_url):
+    try:
+        with urllib.request.urlopen(base_url + "/metrics", timeout=5):
+            return True
+    except (OSError, urllib.error.URLError):
+        return False
+
+
+@scenario("chat_session")
+def bench_chat_session(ctx):
+    session_id = ctx.ensure_session()
+    history = []
+    samples = []
+    tokens_before = ctx.gemini.prompt_tokens
+    for turn in range(ctx.args.chat_turns):
+        prompt = QUERIES[turn % len(QUERIES)]
+        start = time.perf_counter()
+        result = ctx.request("POST", "/chatbot", {
+            "session_id": session_id, "selected_text": QUERIES[0],
+            "current_prompt": prompt, "history": history})
+        samples.append(time.perf_counter() - start)
+        history.append({"user": prompt, "assistant": result.get("response", "")})
+    stats = summarize(samples)
+    return {"turns": len(samples), "last_turn_s": samples[-1],
+            "prompt_tokens_total": ctx.gemini.prompt_tokens - tokens_before,
+            **{f"turn_{k}": v for k, v in stats.items()}}
+
+
+@scenario("podcast")
+def bench_podcast(ctx):
+    session_id = ctx.ensure_session()
+    tts_before = ctx.tts.calls
+    start = time.perf_counter()
+    audio = ctx.request("POST", "/podcast", {"session_id": session_id, "selected_text": QUERIES[2]},
+                        raw=True)
+    return {"podcast_s": time.perf_counter() - start, "audio_bytes": len(audio),
+            "tts_calls": ctx.tts.calls - tts_before}
+
+
+@scenario("quantization")
+def bench_quantization(ctx):
+    """Index size vs. recall@10 (against flat float32) per vector encoding."""
+    import random
+    from backend import relevant_pages
+    from backend.index_store import SegmentStore
+    from benchmarks.corpus import _sentence
+    if ctx.args.embedder == "stub":
+        model = stubs.HashEmbedder()
+    else:
+        model = relevant_pages.get_model()
+    rng = random.Random(ctx.args.seed)
+    texts = [" ".join(_sentence(rng) for _ in range(3)) for _ in range(ctx.args.vectors)]
+    sections = [{"document": f"doc{i % 10}.pdf", "content": text} for i, text in enumerate(texts)]
+    vectors = model.encode(texts, normalize_embeddings=True).astype("float32")
+    queries = model.encode(QUERIES * 10 + texts[:40], normalize_embeddings=True).astype("float32")
+    k = 10
+    result = {"vectors": len(texts), "dim": vectors.shape[1]}
+    reference = None
+    for name, quantization, rerank in [("flat", "flat", False), ("fp16", "fp16", False),
+                                       ("sq8", "sq8", False), ("sq8_rerank", "sq8", True)]:
+        store = SegmentStore(os.path.join(ctx.workdir, f"quant-{name}"), quantization, rerank)
+        store.append(vectors, sections)
+        index, _ = store.load()
+        start = time.perf_counter()
+        for _ in range(ctx.args.repeat):
+            _, ids = index.search(queries, k)
+        search_s = (time.perf_counter() - start) / ctx.args.repeat
+        if reference is None:
+            reference = ids
+        recall = statistics.fmean(len(set(a) & set(b)) / k for a, b in zip(ids, reference))
+        resident = store.size_bytes(include_float32=False)
+        result.update({
+            f"{name}_index_bytes": resident,
+            f"{name}_disk_bytes": store.size_bytes(),
+            f"{name}_bytes_per_vector": resident / len(texts),
+            f"{name}_recall_at_10": recall,
+            f"{name}_search_s": search_s,
+            f"{name}_queries_per_s": len(queries) / search_s,
+        })
+    return result
+
+
+@scenario("role_task")
+def bench_role_task(ctx):
+    """Sequential latency and throughput of N parallel /role-task calls."""
+    session_id = ctx.ensure_session()
+
+    def call(n):
+        start = time.perf_counter()
+        result = ctx.request(
+            "POST", f"/role-task?session_id={session_id}&persona_role=Analyst&task=Summarize%20risks%20{n}",
+            body=b"")
+        if "error" in result:
+            raise RuntimeError(f"/role-task returned an error: {result['error']}")
+        if not result.get("data", {}).get("extracted_sections"):
+            raise RuntimeError("/role-task produced no sections")
+        if result["data"]["metadata"]["job_to_be_done"] != f"Summarize risks {n}":
+            raise RuntimeError("/role-task returned another request's result")
+        return time.perf_counter() - start
+
+    # The first call parses the session's PDFs; later ones hit the parse cache.
+    cold_s = call(0)
+    sequential = [call(i) for i in range(1, max(2, ctx.args.iterations // 10))]
+    calls = max(ctx.args.concurrency, ctx.args.iterations // 5)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ctx.args.concurrency) as pool:
+        parallel = list(pool.map(call, range(calls)))
+    wall = time.perf_counter() - start
+    return {
+        "cold_s": cold_s,
+        **{f"sequential_{k}": v for k, v in summarize(sequential).items()},
+        "parallel_clients": ctx.args.concurrency,
+        "parallel_calls": calls,
+        "parallel_calls_per_s": calls / wall,
+        **{f"parallel_{k}": v for k, v in summarize(parallel).items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--headings_per_page", type=float, default=2.0)
+    parser.add_argument("--font_mix", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chat_turns", type=int, default=10)
+    parser.add_argument("--workers", default="1,2,4",
+                        help="Comma-separated server worker counts for the multi_worker scenario")
+    parser.add_argument("--vectors", type=int, default=20000,
+                        help="Synthetic sections indexed by the quantization scenario")
+    parser.add_argument("--embedder", choices=["stub", "real"], default="stub")
+    parser.add_argument("--embed_latency", type=float, default=0.01,
+                        help="Simulated forward-pass time per encode() call of the stub embedder")
+    parser.add_argument("--llm_latency", type=float, default=0.05)
+    parser.add_argument("--llm_per_1k_tokens", type=float, default=0.02)
+    parser.add_argument("--tts_latency", type=float, default=0.03)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+    ctx = Context(args)
+    try:
+        for name in names:
+            print(f"== {name}")
+            try:
+                results["scenarios"][name] = SCENARIOS[name](ctx)
+            except (RuntimeError, OSError, urllib.error.URLError) as e:
+                results["scenarios"][name] = {"error": str(e)}
+            print(json.dumps(results["scenarios"][name], indent=2))
+    finally:
+        ctx.close()
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Offline stand-ins for Gemini, Azure TTS and the embedding model.
+
+The Gemini and TTS stubs are real local HTTP servers with a configurable,
+size-dependent latency, so benchmarks still pay for a network round trip
+and prompt size shows up in the numbers. The matching client objects are
+drop-in replacements for ``server.model`` and ``server.synthesize_voice``.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def approx_tokens(text):
+    # ~4 characters per token, the usual rule of thumb for English text.
+    return max(1, len(text) // 4)
+
+
+INSIGHTS_JSON = {
+    "key_takeaways": ["Synthetic takeaway one.", "Synthetic takeaway two."],
+    "did_you_know": "Synthetic fact.",
+    "counterpoint": "Synthetic counterpoint.",
+    "inspiration": "Synthetic inspiration.",
+}
+
+PODCAST_JSON = [
+    {"speaker": "Alice" if i % 2 == 0 else "Bob", "line": f"Synthetic podcast line number {i}."}
+    for i in range(12)
+]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        body, content_type = self.server.respond(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, base_latency=0.0):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.base_latency = base_latency
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, payload):
+        raise NotImplementedError
+
+
+class StubGeminiServer(StubServer):
+    """Answers generateContent-like calls; latency grows with prompt tokens."""
+
+    def __init__(self, base_latency=0.05, per_1k_prompt_tokens=0.02):
+        super().__init__(base_latency)
+        self.per_1k_prompt_tokens = per_1k_prompt_tokens
+        self.prompt_tokens = 0
+
+    def respond(self, payload):
+        prompt = payload.get("prompt", "")
+        tokens = approx_tokens(prompt)
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += tokens
+        time.sleep(self.base_latency + self.per_1k_prompt_tokens * tokens / 1000)
+        if "podcast script generator" in prompt:
+            text = json.dumps(PODCAST_JSON)
+        elif payload.get("json"):
+            text = json.dumps(INSIGHTS_JSON)
+        else:
+            text = "Synthetic answer grounded in the provided documents."
+        return json.dumps({"text": text}).encode(), "application/json"
+
+
+class StubTTSServer(StubServer):
+    """Returns deterministic pseudo-MP3 bytes sized like 32 kbit/s speech."""
+
+    def __init__(self, base_latency=0.03, per_char=0.0005):
+        super().__init__(base_latency)
+        self.per_char = per_char
+
+    def respond(self, payload):
+        text = payload.get("text", "")
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.base_latency + self.per_char * len(text))
+        # ~15 characters per second of speech at 4 KB/s.
+        seed = hashlib.sha256(f"{payload.get('voice')}|{text}".encode()).digest()
+        size = max(1024, len(text) * 4096 // 15)
+        return (seed * (size // len(seed) + 1))[:size], "audio/mpeg"
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGeminiModel:
+    """Drop-in for ``genai.GenerativeModel`` that talks to StubGeminiServer."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        wants_json = getattr(generation_config, "response_mime_type", None) == "application/json"
+        body = _post(self.url, {"prompt": prompt, "json": wants_json})
+        return _StubResponse(json.loads(body)["text"])
+
+
+def stub_synthesizer(url):
+    """Return a ``synthesize_voice(text, voice)`` replacement."""
+    def synthesize_voice(text, voice):
+        return _post(url, {"text": text, "voice": voice})
+    return synthesize_voice
+
+
+class HashEmbedder:
+    """Deterministic feature-hashing embedder with the SentenceTransformer
+    ``encode`` surface used by the backend. Fast and model-free, so retrieval
+    benchmarks measure the pipeline rather than the transformer."""
+
+    def __init__(self, dim=768, delay_per_batch=0.0):
+        self.dim = dim
+        self.delay_per_batch = delay_per_batch
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype="float32")
+        for token in TOKEN_RE.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return vec
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.delay_per_batch:
+            time.sleep(self.delay_per_batch)
+        out = np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), "float32")
+        if normalize_embeddings and len(out):
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1, norms)
+        return out[0] if single else out
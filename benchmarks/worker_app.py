@@ -0,0 +1,23 @@
+"""The API server wired to the benchmark stubs, for multi-process serving.
+
+``benchmarks.run``'s ``multi_worker`` scenario starts it with
+``gunicorn -c backend/gunicorn_conf.py benchmarks.worker_app:app`` (or
+``uvicorn --workers`` when gunicorn is missing). Stub endpoints and the
+embedder are passed in through environment variables, because the workers
+are separate processes and cannot be patched from the runner.
+"""
+import os
+
+from backend import relevant_pages, role_task
+from benchmarks import stubs
+
+_EMBED_LATENCY = float(os.getenv("BENCH_EMBED_LATENCY", "0"))
+if os.getenv("BENCH_EMBEDDER", "stub") == "stub":
+    relevant_pages.set_model(stubs.HashEmbedder(delay_per_batch=_EMBED_LATENCY))
+    role_task.set_model(stubs.HashEmbedder(dim=384, delay_per_batch=_EMBED_LATENCY))
+
+from backend import server  # noqa: E402
+
+server.model = stubs.StubGeminiModel(os.environ["BENCH_GEMINI_URL"])
+server.synthesize_voice = stubs.stub_synthesizer(os.environ["BENCH_TTS_URL"])
+app = server.app
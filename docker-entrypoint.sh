@@ -7,9 +7,14 @@ echo "window._env_ = {
   VITE_API_BASE: \"/api\"
 }" > /usr/share/nginx/html/env-config.js
 
-# Start backend in background
+# Start backend in background. WEB_CONCURRENCY>1 runs several workers that
+# share the preloaded embedding model, the session registry and the index.
 echo "Starting backend..."
-uvicorn backend.server:app --host 0.0.0.0 --port 8000 &
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  gunicorn -c backend/gunicorn_conf.py backend.server:app &
+else
+  uvicorn backend.server:app --host 0.0.0.0 --port 8000 &
+fi
 sleep 30
 echo "Backend started on port 8080"
 
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+fitz = pytest.importorskip("fitz")
+
+# Glyphs the normalization helpers treat specially: bullets, dashes, curly
+# quotes and markdown markers, at the line starts where bullets are stripped.
+TYPOGRAPHY_LINES = [
+    "Project “Alpha” overview – phase 1",
+    "• First bullet item that wraps",
+    "across two lines.",
+    " - dash bullet, with comma,",
+    "o letter bullet",
+    "   –  indented en-dash bullet",
+    " •no space after the bullet",
+    "Use *stars* and `code` and snake_case",
+    "Plain closing line!",
+]
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Synthetic PDFs using every benchmark font style (see benchmarks/corpus.py)."""
+    from benchmarks.corpus import generate_corpus
+    return generate_corpus(str(tmp_path_factory.mktemp("corpus")), documents=2, pages=8,
+                           headings_per_page=2.0, font_mix=5, seed=0)
+
+
+@pytest.fixture(scope="session")
+def typography_pdf(tmp_path_factory):
+    """A PDF whose text exercises the bullet, dash and quote handling."""
+    path = str(tmp_path_factory.mktemp("typography") / "typography.pdf")
+    doc = fitz.open()
+    page = doc.new_page()
+    # The Base-14 fonts have no curly quotes; the built-in fallback font does.
+    page.insert_font(fontname="F0", fontbuffer=fitz.Font("cjk").buffer)
+    y = 72
+    for _ in range(3):
+        for line in TYPOGRAPHY_LINES:
+            page.insert_text((72, y), line, fontname="F0", fontsize=11)
+            y += 16
+    doc.save(path)
+    doc.close()
+    return path
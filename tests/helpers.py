@@ -0,0 +1,7 @@
+"""Plain helpers shared by the tests (fixtures live in conftest.py)."""
+import fitz
+
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text() for page in doc]
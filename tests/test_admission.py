@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from backend.admission import AdmissionPool, Overloaded, client_key
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0)
+
+
+def test_freed_slots_go_to_sessions_in_turn():
+    async def main():
+        pool = AdmissionPool("test", limit=1, queue_size=10)
+        ticket = await pool.acquire("holder")
+        granted = []
+
+        async def wait(session, name):
+            granted.append((name, await pool.acquire(session)))
+
+        tasks = [asyncio.create_task(wait(session, name))
+                 for session, name in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]]
+        await _until(lambda: pool.queued == 4)
+        for count in range(1, 5):
+            ticket.release()
+            await _until(lambda: len(granted) == count)
+            ticket = granted[-1][1]
+        ticket.release()
+        await asyncio.gather(*tasks)
+        return [name for name, _ in granted], pool.active
+
+    order, active = asyncio.run(main())
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert active == 0
+
+
+def test_yielding_pool_waits_while_the_priority_pool_has_a_queue():
+    async def main():
+        interactive = AdmissionPool("interactive", limit=1, queue_size=4)
+        ingest = AdmissionPool("ingest", limit=1, queue_size=4, yields_to=[interactive])
+        query = await interactive.acquire("s1")
+        queued_query = asyncio.create_task(interactive.acquire("s2"))
+        upload = asyncio.create_task(ingest.acquire("s3"))
+        await _until(lambda: ingest.queued == 1)
+        assert not upload.done()  # ingest has a free slot, but a query is waiting
+
+        query.release()
+        await _until(upload.done)
+        assert queued_query.done()
+        (await queued_query).release()
+        (await upload).release()
+        return interactive.active, ingest.active
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+def test_full_queue_is_rejected_with_429():
+    async def main():
+        pool = AdmissionPool("test", limit=1, queue_size=1)
+        ticket = await pool.acquire("a")
+        waiter = asyncio.create_task(pool.acquire("b"))
+        await _until(lambda: pool.queued == 1)
+        with pytest.raises(Overloaded) as exc:
+            await pool.acquire("c")
+        ticket.release()
+        (await waiter).release()
+        return exc.value
+
+    error = asyncio.run(main())
+    assert error.status == 429
+    assert error.retry_after >= 1
+
+
+def test_queue_timeout_is_a_503_and_leaves_the_queue():
+    async def main():
+        pool = AdmissionPool("test", limit=1, queue_size=4)
+        ticket = await pool.acquire("a")
+        with pytest.raises(Overloaded) as exc:
+            await pool.acquire("b", timeout=0.01)
+        state = (pool.queued, dict(pool.waiters))
+        ticket.release()
+        return exc.value.status, state, pool.active
+
+    status, (queued, waiters), active = asyncio.run(main())
+    assert status == 503
+    assert (queued, waiters, active) == (0, {}, 0)
+
+
+def test_cancelled_waiter_is_not_granted_a_slot():
+    async def main():
+        pool = AdmissionPool("test", limit=1, queue_size=4)
+        ticket = await pool.acquire("a")
+        waiter = asyncio.create_task(pool.acquire("b"))
+        await _until(lambda: pool.queued == 1)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        queued = pool.queued
+        ticket.release()
+        return queued, pool.active
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+def test_slot_granted_as_the_waiter_gives_up_is_handed_back(monkeypatch):
+    async def main():
+        pool = AdmissionPool("test", limit=1, queue_size=4)
+        ticket = await pool.acquire("a")
+
+        async def grant_then_time_out(awaitable, timeout):
+            # The holder finishes just as the waiter's timeout fires.
+            ticket.release()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(asyncio, "wait_for", grant_then_time_out)
+        with pytest.raises(Overloaded):
+            await pool.acquire("b")
+        return pool.active, pool.queued
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+def _request(headers, client=("127.0.0.1", 40000)):
+    headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "client": client, "headers": headers})
+
+
+def test_client_key_sees_through_the_proxy():
+    assert client_key(_request({"X-Real-IP": "203.0.113.7"})) == "203.0.113.7"
+    assert client_key(_request({"X-Forwarded-For": "10.0.0.1, 203.0.113.8"})) == "203.0.113.8"
+    assert client_key(_request({})) == "127.0.0.1"
+    assert client_key(_request({}, client=None)) is None
@@ -0,0 +1,23 @@
+import os
+
+from backend.audio_cache import DiskLRUCache
+
+
+def _disk_bytes(root):
+    return sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+
+
+def test_eviction_counts_entries_written_by_other_processes(tmp_path):
+    root = str(tmp_path)
+    # Two workers sharing one cache directory, each with its own total.
+    first = DiskLRUCache(root, max_bytes=1000)
+    second = DiskLRUCache(root, max_bytes=1000)
+    for n, cache in enumerate([first, first, first, second, second]):
+        path = cache.put(f"entry{n}", b"x" * 300)
+        os.utime(path, (n, n))
+    assert _disk_bytes(root) == 1500
+
+    first.put("entry5", b"x" * 300)
+    assert first.total_bytes == _disk_bytes(root) <= 900
+    # Least recently used entries went first.
+    assert sorted(os.listdir(root)) == ["entry3.mp3", "entry4.mp3", "entry5.mp3"]
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from backend import relevant_pages
+from backend.batching import MicroBatcher
+from benchmarks.stubs import HashEmbedder
+
+
+class Recorder:
+    """``process_batch`` stand-in that records every batch it is given."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.started = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        self.started.set()
+        if self.fail:
+            raise RuntimeError("search failed")
+        return [item * 10 for item in items]
+
+
+def test_concurrent_submits_share_one_batch():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_batch_size=32, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 10, 20, 30, 40]
+    assert recorder.batches == [[0, 1, 2, 3, 4]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_batch_size=2, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 10, 20, 30, 40]
+    assert recorder.batches == [[0, 1], [2, 3], [4]]
+
+
+def test_exception_reaches_every_caller():
+    batcher = MicroBatcher(Recorder(fail=True), max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert len(errors) == 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_cancelled_callers_are_skipped():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_wait_ms=50)
+
+    async def main():
+        tasks = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0)  # every item is queued, the batch is still open
+        tasks[1].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[0] == 0 and results[2] == 20
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert recorder.batches == [[0, 2]]
+
+
+class DepthSensitiveIndex:
+    """Stands in for a re-ranked quantized segment: which candidates come
+    back depends on ``k``, so a deeper search changes the best hits."""
+
+    def search(self, queries, k):
+        order = np.arange(k)[::-1] if k > 15 else np.arange(k)
+        scores = np.tile(np.linspace(1.0, 0.0, k, dtype="float32"), (len(queries), 1))
+        return scores, np.tile(order, (len(queries), 1))
+
+
+@pytest.fixture
+def depth_index(monkeypatch):
+    metadata = [{"document": f"doc{i}.pdf", "page": i, "title": f"Section {i}",
+                 "content": f"Body of section {i}."} for i in range(60)]
+    monkeypatch.setattr(relevant_pages, "load_session_index", lambda: (DepthSensitiveIndex(), metadata))
+    monkeypatch.setattr(relevant_pages, "model", HashEmbedder(dim=16))
+
+
+def test_mixed_top_k_batch_matches_separate_calls(depth_index):
+    queries = [("budget review", 2), ("travel plans", 10), ("budget review", 10), ("packing", 5)]
+    batched = relevant_pages.get_relevant_pages_batch(queries)
+    assert batched == [relevant_pages.get_relevant_pages_batch([query])[0] for query in queries]
+    assert [len(results) for results in batched] == [2, 10, 10, 5]
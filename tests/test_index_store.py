@@ -0,0 +1,170 @@
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+from backend import index_store
+from backend.index_store import SEGMENTS_DIRNAME, SegmentStore, build_index, store_for
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "locks")
+    monkeypatch.setattr(index_store, "INDEX_LOCK_DIR", path)
+    return path
+
+
+def _sections(n, start=0):
+    return [{"document": f"doc{(start + i) // 4}.pdf", "content": f"section {start + i}"}
+            for i in range(n)]
+
+
+def _vectors(n, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, 32)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _decoded(store):
+    index, _ = store.load()
+    return np.vstack([segment.reconstruct_n(0, segment.ntotal) for segment in index.segments])
+
+
+def _store(tmp_path, quantization, rerank=False):
+    return SegmentStore(str(tmp_path / f"segments-{quantization}"), quantization=quantization, rerank=rerank)
+
+
+@pytest.fixture
+def train_rows(monkeypatch):
+    monkeypatch.setattr(index_store, "INDEX_SQ_TRAIN_ROWS", 30)
+    monkeypatch.setattr(index_store, "MAX_SEGMENTS", 100)  # compact() is called explicitly
+
+
+def test_compaction_concatenates_codes_under_the_store_ranges(tmp_path, train_rows):
+    store = _store(tmp_path, "sq8")
+    batches = [_vectors(40, 0), _vectors(20, 1), _vectors(20, 2)]
+    store.append(batches[0], _sections(40))
+    store.append(batches[1], _sections(20, 40))
+    store.compact()
+    store.append(batches[2], _sections(20, 60))
+    store.compact()
+
+    manifest = store.read_manifest()
+    assert [seg["count"] for seg in manifest["segments"]] == [80]
+    assert not [name for name in os.listdir(store.root) if name.endswith(".npy")]
+    # The ranges were trained on the first batch only, and every later
+    # vector was encoded with them.
+    trained = build_index(batches[0], "sq8")
+    np.testing.assert_array_equal(manifest["sq_ranges"]["sq8"], index_store.sq_ranges(trained))
+    expected = build_index(np.vstack(batches), "sq8", index_store.sq_ranges(trained))
+    np.testing.assert_array_equal(_decoded(store), expected.reconstruct_n(0, 80))
+
+
+def test_small_first_batches_stay_float32_until_ranges_can_be_trained(tmp_path, train_rows):
+    store = _store(tmp_path, "sq8")
+    batches = [_vectors(20, 0), _vectors(20, 1)]
+    store.append(batches[0], _sections(20))
+    store.append(batches[1], _sections(20, 20))
+    assert "sq_ranges" not in store.read_manifest()
+    np.testing.assert_array_equal(_decoded(store), np.vstack(batches))
+
+    store.compact()
+    manifest = store.read_manifest()
+    assert [seg.get("quantization") for seg in manifest["segments"]] == ["sq8"]
+    expected = build_index(np.vstack(batches), "sq8")
+    np.testing.assert_array_equal(_decoded(store), expected.reconstruct_n(0, 40))
+
+
+@pytest.mark.parametrize("quantization, max_ratio", [("fp16", 0.55), ("sq8", 0.3)])
+def test_quantized_store_is_smaller_than_flat(tmp_path, train_rows, quantization, max_ratio):
+    stores = {q: _store(tmp_path, q) for q in ("flat", quantization)}
+    for store in stores.values():
+        for i in range(8):
+            store.append(_vectors(25, i), _sections(25, 25 * i))
+        store.compact()
+    assert stores[quantization].size_bytes() < max_ratio * stores["flat"].size_bytes()
+
+
+def test_only_reranked_stores_keep_float32_sidecars(tmp_path, train_rows):
+    for rerank in (False, True):
+        store = SegmentStore(str(tmp_path / f"rerank-{rerank}"), quantization="sq8", rerank=rerank)
+        store.append(_vectors(40, 0), _sections(40))
+        store.append(_vectors(40, 1), _sections(40, 40))
+        store.compact()
+        assert [seg.get("float32", False) for seg in store.read_manifest()["segments"]] == [rerank]
+        assert (store.size_bytes(include_float32=True) > store.size_bytes(include_float32=False)) == rerank
+
+
+def test_compaction_leaves_segments_with_their_own_ranges(tmp_path, train_rows):
+    store = _store(tmp_path, "sq8")
+    store.append(_vectors(40, 0), _sections(40))
+    store.append(_vectors(40, 1), _sections(40, 40))
+    # Segments written before the store kept shared ranges were each trained
+    # on their own vectors; only their codes are left.
+    manifest = store.read_manifest()
+    del manifest["sq_ranges"]
+    with open(store.manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    for i, seg in enumerate(manifest["segments"]):
+        index_store.atomic_write_index(build_index(_vectors(40, i), "sq8"),
+                                       os.path.join(store.root, f"{seg['name']}.faiss"))
+    before = _decoded(store)
+
+    store.compact()
+    assert store.read_manifest()["segments"] == manifest["segments"]
+    np.testing.assert_array_equal(_decoded(store), before)
+
+
+def test_reading_an_existing_store_takes_no_lock(tmp_path, monkeypatch):
+    store = SegmentStore(str(tmp_path / SEGMENTS_DIRNAME), quantization="flat", rerank=False)
+    store.append(_vectors(4, 0), _sections(4))
+    flocks = []
+    monkeypatch.setattr(index_store.fcntl, "flock", lambda fd, op: flocks.append(op))
+    for _ in range(5):
+        store_for(str(tmp_path / "mysession_index.faiss"), str(tmp_path / "mysession_metadata.json"))
+        store.version()
+    assert flocks == []
+
+
+def test_lock_file_outlives_the_session_folder(tmp_path):
+    session = tmp_path / "round1b"
+    store = SegmentStore(str(session / SEGMENTS_DIRNAME), quantization="flat", rerank=False)
+    store.append(_vectors(4, 0), _sections(4))
+    shutil.rmtree(session)
+    assert os.path.exists(store.lock.path)
+
+
+def _append_documents(root, lock_dir, worker, count):
+    index_store.INDEX_LOCK_DIR = lock_dir
+    store = SegmentStore(root, quantization="flat", rerank=False)
+    for i in range(count):
+        doc = f"worker{worker}-doc{i}.pdf"
+        sections = [{"document": doc, "content": f"{doc} part {j}"} for j in range(3)]
+        # Same check-then-append as save_pdfs.append_sections.
+        with store.lock:
+            if doc not in store.documents():
+                store.append(_vectors(3, worker * count + i), sections)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join()  # background compactions
+
+
+def test_concurrent_writer_processes_keep_every_append(tmp_path, lock_dir):
+    root = str(tmp_path / SEGMENTS_DIRNAME)
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_append_documents, args=(root, lock_dir, w, 20)) for w in range(4)]
+    for proc in workers:
+        proc.start()
+    for proc in workers:
+        proc.join()
+    assert [proc.exitcode for proc in workers] == [0, 0, 0, 0]
+
+    store = SegmentStore(root, quantization="flat", rerank=False)
+    assert len(store.documents()) == 80
+    index, metadata = store.load()
+    assert index.ntotal == len(metadata) == 240
+    assert not [name for name in os.listdir(root) if name.endswith(".tmp")]
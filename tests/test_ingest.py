@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import ingest
+from backend.ingest import StreamingPDFUpload, UploadError, ingest_upload
+
+BOUNDARY = "test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _body(parts):
+    body = b""
+    for field, filename, data in parts:
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                 f"filename=\"{filename}\"\r\nContent-Type: application/pdf\r\n\r\n").encode()
+        body += data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def _stream(body, chunk_size=7):
+    # Small chunks split headers and data across parser calls.
+    for i in range(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.headers = {"content-type": CONTENT_TYPE}
+        self.body = body
+
+    def stream(self):
+        return _stream(self.body)
+
+
+def _receive(folder, body):
+    received = []
+    upload = StreamingPDFUpload(CONTENT_TYPE, folder, lambda *args: received.append(args))
+    filenames = asyncio.run(upload.receive(_stream(body)))
+    return filenames, received
+
+
+def test_repeated_filenames_are_saved_under_numbered_names(tmp_path):
+    first, second = b"%PDF first" * 50, b"%PDF second" * 50
+    filenames, received = _receive(tmp_path, _body(
+        [("pdfs", "report.pdf", first), ("pdfs", "report.pdf", second)]))
+    assert filenames == ["report.pdf", "report-2.pdf"]
+    assert [(name, digest) for name, _, digest in received] == [
+        ("report.pdf", hashlib.sha256(first).hexdigest()),
+        ("report-2.pdf", hashlib.sha256(second).hexdigest())]
+    assert (tmp_path / "report.pdf").read_bytes() == first
+    assert (tmp_path / "report-2.pdf").read_bytes() == second
+
+
+@pytest.mark.parametrize("field, filename, message", [
+    ("files", "notes.pdf", "Unexpected file field 'files'"),
+    ("pdfs", "notes.txt", "notes.txt is not a PDF file"),
+])
+def test_rejected_part_removes_the_files_already_received(tmp_path, field, filename, message):
+    body = _body([("pdfs", "good.pdf", b"%PDF good"), (field, filename, b"data")])
+    with pytest.raises(UploadError, match=message):
+        _receive(tmp_path, body)
+    assert os.listdir(tmp_path) == []
+
+
+def test_truncated_upload_removes_its_files(tmp_path):
+    body = _body([("pdfs", "good.pdf", b"%PDF good"), ("pdfs", "cut.pdf", b"%PDF cut" * 100)])
+    with pytest.raises(UploadError, match="cut.pdf"):
+        _receive(tmp_path, body[:len(body) // 2 + 200])
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def fake_indexing(monkeypatch):
+    """Parse in a thread instead of the spawn pool and record what would be
+    appended to the index."""
+    calls = {"parsed": [], "finished": [], "appended": []}
+
+    def extract(path):
+        calls["parsed"].append(os.path.basename(path))
+        time.sleep(0.2)
+        calls["finished"].append(os.path.basename(path))
+        return [{"document": os.path.basename(path), "content": "body"}]
+
+    def append(model, index_path, meta_path, sections):
+        calls["appended"].extend(sections)
+        return len(sections)
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(ingest, "get_parse_pool", lambda: pool)
+    monkeypatch.setattr(ingest, "extract_document_sections", extract)
+    monkeypatch.setattr(ingest, "append_sections", append)
+    yield calls
+    pool.shutdown()
+
+
+def test_duplicate_content_is_parsed_once_and_indexed_under_each_name(tmp_path, fake_indexing):
+    body = _body([("pdfs", "a.pdf", b"%PDF same"), ("pdfs", "b.pdf", b"%PDF same")])
+    filenames = asyncio.run(ingest_upload(FakeRequest(body), tmp_path, model=None))
+    assert filenames == ["a.pdf", "b.pdf"]
+    assert fake_indexing["parsed"] == ["a.pdf"]
+    assert [sec["document"] for sec in fake_indexing["appended"]] == ["a.pdf", "b.pdf"]
+
+
+def test_failed_upload_waits_for_its_parses_and_indexes_nothing(tmp_path, fake_indexing):
+    body = _body([("pdfs", "good.pdf", b"%PDF good"), ("pdfs", "bad.txt", b"data")])
+    with pytest.raises(UploadError):
+        asyncio.run(ingest_upload(FakeRequest(body), tmp_path, model=None))
+    assert os.listdir(tmp_path) == []
+    # good.pdf's parse was either cancelled before it started or had
+    # finished before the error surfaced.
+    assert fake_indexing["finished"] == fake_indexing["parsed"]
+    assert fake_indexing["appended"] == []
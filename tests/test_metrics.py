@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from backend import metrics
+
+
+def _record(stage, started, release):
+    with metrics.timed(stage):
+        started.wait()
+        release.wait()
+    return stage
+
+
+def test_traced_calls_in_threads_keep_their_own_observations():
+    if not metrics.ENABLED:
+        pytest.skip("METRICS_ENABLED=0")
+    started = threading.Barrier(2)
+    release = threading.Event()
+    results = {}
+
+    def run(stage):
+        results[stage] = metrics.traced_call("trace", _record, stage, started, release)
+
+    threads = [threading.Thread(target=run, args=(stage,)) for stage in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    for stage, (result, observations) in results.items():
+        assert result == stage
+        assert [(kind, name) for kind, name, _, _ in observations] == [("stage", stage)]
+
+
+def test_traced_call_does_not_print(capsys):
+    metrics.traced_call("trace", len, "abc")
+    assert capsys.readouterr().out == ""
+
+
+def _record_in_worker(multiproc_dir):
+    metrics.MULTIPROC_DIR = multiproc_dir
+    metrics.count("snapshot_merge", 5)
+    metrics.record_stage("snapshot_merge", 0.02)
+    metrics.write_snapshot()
+
+
+def test_metrics_are_summed_across_worker_snapshots(tmp_path, monkeypatch):
+    if not metrics.ENABLED:
+        pytest.skip("METRICS_ENABLED=0")
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+    worker = multiprocessing.get_context("spawn").Process(target=_record_in_worker, args=(str(tmp_path),))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    before = metrics.ITEMS.values.get((("stage", "snapshot_merge"),), 0)
+    metrics.count("snapshot_merge", 3)
+    metrics.record_stage("snapshot_merge", 0.02)
+
+    lines = metrics.render_metrics().splitlines()
+    assert f'pipeline_items_total{{stage="snapshot_merge"}} {before + 8}' in lines
+    assert 'stage_duration_seconds_count{stage="snapshot_merge"} 2' in lines
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [f"metrics-{worker.pid}.json", f"metrics-{os.getpid()}.json"])
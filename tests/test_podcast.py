@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+
+import pytest
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from backend import relevant_pages, role_task
+from backend.admission import Admission
+from backend.audio_cache import DiskLRUCache
+from benchmarks.stubs import HashEmbedder
+
+DIALOGUE = [{"speaker": "Alice", "line": f"Line {i}."} if i % 2 == 0 else
+            {"speaker": "Bob", "line": f"Line {i}."} for i in range(6)]
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    pytest.importorskip("azure.cognitiveservices.speech")
+    pytest.importorskip("google.generativeai")
+    # The server creates round1b/, sessions.db and audio_cache/ relative to cwd.
+    cwd = os.getcwd()
+    models = relevant_pages.model, role_task.model
+    os.chdir(tmp_path_factory.mktemp("server"))
+    try:
+        relevant_pages.set_model(HashEmbedder())
+        role_task.set_model(HashEmbedder(dim=384))
+        from backend import server
+    finally:
+        os.chdir(cwd)
+        relevant_pages.set_model(models[0])
+        role_task.set_model(models[1])
+    return server
+
+
+class FakeStore:
+    def version(self):
+        return "index-v1"
+
+
+@pytest.fixture
+def podcast_app(server, tmp_path, monkeypatch):
+    async def insights(request):
+        return {"insights": [{"type": "Key Insight", "text": "Budgets grew."}]}
+
+    def synthesize(line, voice):
+        return line.encode()
+
+    # Keep every response stream referenced, as a server's connection state
+    # may, so a ticket is never released by the generator being finalized.
+    streams = []
+    stream_init = StreamingResponse.__init__
+
+    def init(self, content, *args, **kwargs):
+        stream_init(self, content, *args, **kwargs)
+        streams.append(self.body_iterator)
+
+    monkeypatch.setattr(StreamingResponse, "__init__", init)
+    monkeypatch.setattr(server, "SESSION_FOLDERS", {"session": tmp_path})
+    monkeypatch.setattr(server, "ADMISSION", Admission(workers=1))
+    monkeypatch.setattr(server, "EPISODE_CACHE", DiskLRUCache(str(tmp_path / "episodes"), 1 << 20))
+    monkeypatch.setattr(server, "store_for", lambda index_path, meta_path: FakeStore())
+    monkeypatch.setattr(server, "generate_insights", insights)
+    monkeypatch.setattr(server, "generate_podcast_script", lambda text, insights: DIALOGUE)
+    monkeypatch.setattr(server, "synthesize_voice_cached", synthesize)
+    return server
+
+
+async def _post_podcast(app, spec_version="2.3", disconnect_after=None):
+    """Drive one POST /podcast through the ASGI app. With ``disconnect_after``,
+    the client stops reading once that many audio chunks have arrived and then
+    goes away: an ASGI 2.3 server reports it through receive, a 2.4 server by
+    failing the pending send."""
+    body = json.dumps({"session_id": "session", "selected_text": "budget"}).encode()
+    gone = asyncio.Event()
+    chunks = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body" and message.get("body"):
+            if disconnect_after and len(chunks) >= disconnect_after:
+                if not gone.is_set():
+                    # The stream backs up behind this send, then the client drops.
+                    await asyncio.sleep(0.05)
+                    gone.set()
+                if spec_version >= "2.4":
+                    raise OSError("connection reset by peer")
+                return
+            chunks.append(message["body"])
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": spec_version},
+             "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/podcast",
+             "raw_path": b"/podcast", "query_string": b"", "root_path": "",
+             "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+             "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")]}
+    try:
+        await app(scope, receive, send)
+    except (ClientDisconnect, OSError):
+        if not disconnect_after:
+            raise
+    return chunks
+
+
+def _episode_id(server):
+    return server.episode_key("index-v1", "budget")
+
+
+def test_completed_episode_releases_its_ticket_and_is_cached(podcast_app):
+    async def main():
+        chunks = await _post_podcast(podcast_app.app)
+        return chunks, podcast_app.ADMISSION.podcast.active
+
+    chunks, active = asyncio.run(main())
+    assert b"".join(chunks) == b"".join(turn["line"].encode() for turn in DIALOGUE)
+    assert active == 0
+    assert podcast_app.EPISODE_CACHE.lookup(_episode_id(podcast_app))
+
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_client_disconnect_releases_the_ticket(podcast_app, spec_version):
+    async def main():
+        chunks = await _post_podcast(podcast_app.app, spec_version, disconnect_after=2)
+        return chunks, podcast_app.ADMISSION.podcast.active
+
+    chunks, active = asyncio.run(main())
+    assert len(chunks) == 2
+    assert active == 0
+    assert podcast_app.EPISODE_CACHE.lookup(_episode_id(podcast_app)) is None
@@ -0,0 +1,34 @@
+import pytest
+
+from backend.process_pdfs import page_ranges, process_pdf
+
+
+@pytest.fixture(scope="module")
+def mixed_pdf(tmp_path_factory):
+    """12 pages drawing on every benchmark font style."""
+    from benchmarks.corpus import generate_pdf
+    path = str(tmp_path_factory.mktemp("sharded") / "mixed.pdf")
+    return generate_pdf(path, pages=12, headings_per_page=2.0, font_mix=5, seed=3)["path"]
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_sharded_parse_matches_serial(mixed_pdf, workers):
+    serial = process_pdf(mixed_pdf, workers=1)
+    assert serial["outline"]
+    assert process_pdf(mixed_pdf, workers=workers) == serial
+
+
+@pytest.mark.parametrize("page_count, shards, expected", [
+    (12, 3, [(0, 4), (4, 8), (8, 12)]),
+    # Uneven split: the first shards take one extra page each.
+    (10, 3, [(0, 4), (4, 7), (7, 10)]),
+    # Fewer pages than shards: no empty ranges.
+    (2, 4, [(0, 1), (1, 2)]),
+    (1, 1, [(0, 1)]),
+    (0, 3, []),
+])
+def test_page_ranges(page_count, shards, expected):
+    ranges = page_ranges(page_count, shards)
+    assert ranges == expected
+    # Contiguous and covering every page exactly once.
+    assert [page for start, stop in ranges for page in range(start, stop)] == list(range(page_count))
@@ -0,0 +1,83 @@
+import re
+
+import pytest
+
+from backend.prompt_context import (
+    HISTORY_BLOCK_TURNS, RECENT_TURNS, build_history, estimate_tokens, pack_chunks)
+
+CONDENSED_HEADER = "Earlier conversation (condensed):\n"
+
+
+def _turn(n, words=40):
+    return {"user": f"question {n} " + "budget " * words,
+            "assistant": f"answer {n} " + "travel plans " * words}
+
+
+def _condensed(text):
+    if not text.startswith(CONDENSED_HEADER):
+        return ""
+    return text.split("\n\n", 1)[0]
+
+
+def test_newest_turn_is_kept_when_history_is_over_budget():
+    history = [_turn(n, words=400) for n in range(3)] + [{"user": "latest question", "assistant": "latest answer"}]
+    text = build_history(history, budget=200)
+    assert estimate_tokens(text) <= 200
+    assert text.endswith("User: latest question\nAssistant: latest answer")
+    # Older recent turns are dropped or cut, never the newest one.
+    assert "question 0 " not in text
+
+
+@pytest.mark.parametrize("budget", [800, 2400])
+def test_condensed_prefix_is_byte_stable_between_evictions(budget):
+    history, previous, first_turns = [], "", []
+    for n in range(80):
+        history.append(_turn(n))
+        text = build_history(history, budget=budget)
+        assert estimate_tokens(text) <= budget
+        assert text.endswith(f"User: {history[-1]['user']}\nAssistant: {history[-1]['assistant']}")
+        condensed = _condensed(text)
+        if n >= RECENT_TURNS + HISTORY_BLOCK_TURNS:
+            # Eviction never drops every condensed block at once.
+            assert condensed
+        first = re.search(r"- Q: question (\d+) ", condensed)
+        if not first:
+            continue
+        first_turn = int(first.group(1))
+        if first_turns and first_turn == first_turns[-1]:
+            # No eviction: the condensed part only grows at its end.
+            assert condensed.startswith(previous)
+        else:
+            assert not first_turns or first_turn > first_turns[-1]
+            assert first_turn % HISTORY_BLOCK_TURNS == 0
+            first_turns.append(first_turn)
+        previous = condensed
+    assert len(first_turns) > 2
+    if budget >= 2400:
+        # Room for several condensed blocks: evictions drop several at once.
+        assert all(b - a > HISTORY_BLOCK_TURNS for a, b in zip(first_turns, first_turns[1:]))
+
+
+def test_pack_chunks_dedups_orders_and_stops_at_budget():
+    chunks = [
+        {"pdfName": "a.pdf", "pageNo": 1, "title": "Low", "snippet": "low score text", "score": 0.1},
+        {"pdfName": "b.pdf", "pageNo": 2, "title": "High", "snippet": "Same  snippet.", "score": 0.9},
+        {"pdfName": "c.pdf", "pageNo": 3, "title": "Dup", "snippet": "same snippet", "score": 0.5},
+        {"pdfName": "d.pdf", "pageNo": 4, "title": "Mid", "snippet": "middle text", "score": 0.4},
+    ]
+    assert pack_chunks(chunks).splitlines() == [
+        "[1] b.pdf p.2 | High: Same snippet.",
+        "[2] d.pdf p.4 | Mid: middle text",
+        "[3] a.pdf p.1 | Low: low score text",
+    ]
+    # Packing stops before the chunk that would exceed the budget.
+    budget = estimate_tokens("[1] b.pdf p.2 | High: Same snippet.") + 5
+    assert pack_chunks(chunks, budget=budget) == "[1] b.pdf p.2 | High: Same snippet."
+
+
+def test_pack_chunks_truncates_a_single_oversized_chunk():
+    chunk = {"pdfName": "a.pdf", "pageNo": 1, "title": "Long", "snippet": "word " * 500, "score": 1.0}
+    text = pack_chunks([chunk], budget=20)
+    assert text.startswith("[1] a.pdf p.1 | Long: word")
+    assert text.endswith("…")
+    assert len(text) <= 20 * 4 + 1
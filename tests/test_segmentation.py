@@ -0,0 +1,59 @@
+from tests.helpers import page_texts
+
+from backend.process_pdfs import process_pdf
+from backend.segmentation import (
+    build_heading_index, resolve_heading_page, section_headings, segment_sections)
+
+
+def test_headings_at_page_boundaries_get_their_own_page():
+    pages = ["Intro\nbody a\nSetup", "more setup\nSummary\nend one", "Summary\nfinal words"]
+    headings = [["Intro", 0], ["Setup", 0], ["Summary", 1], ["Summary", 2]]
+    assert segment_sections(pages, headings) == [
+        {"title": "Intro", "content": "body a\n", "page": 0},
+        # Last line of page 0; its body continues on page 1.
+        {"title": "Setup", "content": "more setup\n", "page": 0},
+        {"title": "Summary", "content": "end one\n", "page": 1},
+        # First line of page 2, right after the page join.
+        {"title": "Summary", "content": "final words\n", "page": 2},
+    ]
+
+
+def test_page_offsets_survive_empty_pages_and_trailing_newlines():
+    pages = ["Title\nfirst\n", "", "\n", "Results\nnumbers\n", "Appendix"]
+    headings = [["Title", 0], ["Results", 3], ["Appendix", 4]]
+    sections = segment_sections(pages, headings)
+    assert [(sec["title"], sec["page"]) for sec in sections] == [
+        ("Title", 0), ("Results", 3), ("Appendix", 4)]
+    assert sections[1]["content"] == "numbers\n\n"
+
+
+def test_resolve_heading_page():
+    entry = build_heading_index([["Notes", 5], ["Notes", 2], ["Notes", 9]])["Notes"]
+    assert entry[0] == [2, 5, 9]
+    assert resolve_heading_page(entry, 5) == 5
+    # Text seen where it was not detected: nearest earlier occurrence...
+    assert resolve_heading_page(entry, 7) == 5
+    assert resolve_heading_page(entry, 100) == 9
+    # ...or the first one when the text comes before every occurrence.
+    assert resolve_heading_page(entry, 0) == 2
+
+
+def test_repeated_heading_text_keeps_each_occurrence():
+    # A table of contents on page 0 repeats headings detected on later pages.
+    pages = ["Contents\nBudget\nTravel", "Budget\nfigures", "Travel\nplans", "Budget\nrevised"]
+    headings = [["Contents", 0], ["Budget", 1], ["Travel", 2], ["Budget", 3]]
+    assert [(sec["title"], sec["page"]) for sec in segment_sections(pages, headings)] == [
+        ("Contents", 0), ("Budget", 1), ("Travel", 2), ("Budget", 1), ("Travel", 2), ("Budget", 3)]
+
+
+def test_sections_of_real_pdfs_start_on_the_heading_page(corpus):
+    for doc in corpus:
+        pages = page_texts(doc["path"])
+        headings = section_headings(process_pdf(doc["path"], workers=1)["outline"])
+        detected = {(text, page) for text, page in headings}
+        sections = segment_sections(pages, headings)
+        assert len(sections) >= len(detected)
+        for sec in sections:
+            page_lines = [line.strip() for line in pages[sec["page"]].splitlines()]
+            assert sec["title"] in page_lines
+            assert (sec["title"], sec["page"]) in detected
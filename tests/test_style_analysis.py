@@ -0,0 +1,65 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from backend.process_pdfs import process_pdf
+from backend.save_pdfs import extract_document_sections
+
+BODY_LINE = "Travel budget review and schedule notes for the regional partner meeting."
+
+# (font size, text) per page; None is a paragraph of 10pt body text. Four
+# heading sizes, so the two smallest both rank as H3.
+PAGE_LAYOUT = [
+    (20, "Chapter {p} Overview"),
+    (None, None),
+    (15, "Section {p}.1 Planning"),
+    (None, None),
+    (12.5, "Step {p}.1.1 Booking"),
+    (None, None),
+    (12.5, "Step {p}.1.2 Packing"),
+    (None, None),
+    (11.5, "Note {p}.1.2.1 Receipts"),
+    (None, None),
+]
+EXPECTED_LEVELS = ["H1", "H2", "H3", "H3", "H3"]
+
+
+@pytest.fixture(scope="module")
+def nested_pdf(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("nested") / "nested.pdf")
+    doc = fitz.open()
+    for p in range(1, 3):
+        page = doc.new_page()
+        y = 60
+        for size, text in PAGE_LAYOUT:
+            if size is None:
+                for i in range(6):
+                    y += 14
+                    page.insert_text((56, y), f"{BODY_LINE} Line {i}.", fontname="helv", fontsize=10)
+            else:
+                y += size + 6
+                page.insert_text((56, y), text.format(p=p), fontname="helv", fontsize=size)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_heading_sizes_rank_into_three_levels(nested_pdf):
+    outline = process_pdf(nested_pdf, workers=1)["outline"]
+    headings = [text for size, text in PAGE_LAYOUT if size]
+    expected = [(level, text.format(p=p), p - 1)
+                for p in range(1, 3)
+                for level, text in zip(EXPECTED_LEVELS, headings)]
+    assert [(h["level"], h["text"], h["page"]) for h in outline] == expected
+
+
+def test_h3_headings_start_their_own_sections(nested_pdf):
+    sections = extract_document_sections(nested_pdf)
+    titles = [text.format(p=p) for p in range(1, 3) for size, text in PAGE_LAYOUT if size]
+    assert [sec["title"] for sec in sections] == titles
+    for sec in sections:
+        # Each section holds one paragraph, never the following subsection.
+        body = sec["content"][len(sec["title"]):]
+        assert body.count("Line 0.") == 1
+        assert not any(title in body for title in titles)
+    assert [sec["page"] for sec in sections] == [1] * 5 + [2] * 5
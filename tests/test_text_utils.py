@@ -0,0 +1,43 @@
+import pytest
+
+from backend.text_utils import (
+    INDENTED_BULLET_PREFIX_RE, clean_text, clean_texts, combine_lines, combine_lines_bulk)
+from benchmarks import baseline_text
+from tests.helpers import page_texts
+
+
+@pytest.fixture(scope="module")
+def pages(corpus, typography_pdf):
+    texts = [text for doc in corpus for text in page_texts(doc["path"])]
+    return texts + page_texts(typography_pdf)
+
+
+@pytest.fixture(scope="module")
+def markdown_pages(corpus, typography_pdf):
+    pymupdf4llm = pytest.importorskip("pymupdf4llm")
+    return [pymupdf4llm.to_markdown(path) for path in [doc["path"] for doc in corpus] + [typography_pdf]]
+
+
+def test_clean_text_matches_baseline(pages, markdown_pages):
+    lines = [line for text in pages + markdown_pages for line in text.splitlines()]
+    lines += ["", None, "  **Bold**  heading  ", "a–b “c” _d_ `e`"]
+    expected = [baseline_text.clean_text(line) for line in lines]
+    assert [clean_text(line) for line in lines] == expected
+    assert clean_texts(lines) == expected
+
+
+def test_combine_lines_matches_baseline(pages):
+    expected = [baseline_text.combine_lines(text) for text in pages]
+    assert [combine_lines(text) for text in pages] == expected
+    assert combine_lines_bulk(pages) == expected
+
+
+def test_indented_combine_lines_matches_baseline(pages):
+    for text in pages:
+        assert combine_lines(text, INDENTED_BULLET_PREFIX_RE) == baseline_text.combine_lines_indented(text)
+
+
+def test_combine_lines_joins_wrapped_lines():
+    # Unterminated lines are joined with ", ", the closing line with " ".
+    assert combine_lines("• first\nsecond\nthird.\nalone!\ntrailing") == \
+        "first, second third. alone! trailing"